@@ -0,0 +1,128 @@
+"""
+Compare crop.crop_image with the original numpy implementation.
+
+    python benchmarks/crop_benchmark.py
+    python benchmarks/crop_benchmark.py --verify assets/images
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crop import crop_image
+
+
+def original_crop_image(pil_image: Image.Image):
+    pil_image = pil_image.convert('RGBA')
+    np_array = np.array(pil_image)
+    blank_px = pil_image.getpixel((0,0))
+    mask = np_array != blank_px
+    mask = np.take(mask,axis=2,indices=3)
+    coords = np.argwhere(mask)
+    if 0 not in coords.shape:
+        x0, y0 = coords.min(axis=0)
+        x1, y1 = coords.max(axis=0) + 1
+        cropped_box = np_array[x0:x1, y0:y1]
+        pil_image = Image.fromarray(cropped_box, 'RGBA')
+    
+    return pil_image
+
+
+SIZES = {
+    'portrait': (256, 256),
+    'full': (512, 512),
+    'background': (2048, 1248),
+}
+
+def make_image(size: tuple[int, int], padding: int):
+    rng = np.random.default_rng(0)
+    width, height = size
+    array = np.zeros((height, width, 4), dtype = np.uint8)
+    array[padding:height - padding, padding:width - padding] = rng.integers(
+        1, 256,
+        (height - padding * 2, width - padding * 2, 4),
+        dtype = np.uint8,
+    )
+    return Image.fromarray(array, 'RGBA')
+
+def time_crop(function, image: Image.Image, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(image)
+    return (time.perf_counter() - start) / repeat
+
+def same_image(a: Image.Image, b: Image.Image):
+    return a.size == b.size and a.mode == b.mode and a.tobytes() == b.tobytes()
+
+def benchmark(repeat: int):
+    print(f'{"input":<24}{"original":>12}{"new":>12}{"speedup":>10}')
+    for name, size in SIZES.items():
+        for padding, label in ((size[0] // 8, 'padded'), (0, 'tight')):
+            image = make_image(size, padding)
+            image.load()
+            if not same_image(original_crop_image(image), crop_image(image)):
+                raise AssertionError(f'{name} {label} output differs')
+            
+            original = time_crop(original_crop_image, image, repeat)
+            new = time_crop(crop_image, image, repeat)
+            print(f'{f"{name} {label}":<24}{original * 1000:>10.2f}ms{new * 1000:>10.2f}ms{original / new:>9.1f}x')
+
+def verify(folder: str):
+    checked = 0
+    failed = 0
+    for root, dirs, files in os.walk(folder):
+        for filename in files:
+            if not filename.endswith('.png'):
+                continue
+            
+            path = os.path.join(root, filename)
+            image = Image.open(path)
+            image.load()
+            # pad the image so both implementations have something to crop
+            padded = Image.new('RGBA', (image.width + 10, image.height + 6))
+            padded.paste(image.convert('RGBA'), (5, 3))
+
+            for source in (image, padded):
+                if not same_image(original_crop_image(source), crop_image(source)):
+                    print(f'output differs: {path}')
+                    failed += 1
+                    break
+            
+            checked += 1
+    
+    print(f'checked {checked} images, {failed} differ')
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description = 'Benchmark crop_image against the original numpy implementation',
+    )
+
+    argparser.add_argument(
+        '-r', '--repeat',
+        type = int,
+        default = 20,
+        help = 'Times to crop each image (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--verify',
+        metavar = 'FOLDER',
+        help = 'Check that both implementations give the same output for every png in this folder',
+    )
+
+    args = argparser.parse_args()
+
+    if args.verify:
+        if not verify(args.verify):
+            sys.exit(1)
+    else:
+        benchmark(args.repeat)
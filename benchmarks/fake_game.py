@@ -0,0 +1,654 @@
+"""
+Generate a fake game folder that update_ponies can read.
+
+Everything is made up, but it's consistent: every pony lives in a house that
+exists, every shop has a consumable, every image and sprite that an object
+points to exists, and every string key is in the loc files. The number of
+ponies sets the size, and the other categories are scaled to match the real
+game.
+
+    python benchmarks/fake_game.py fake-game --ponies 2000
+"""
+
+import json
+import os
+import random
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+
+from PIL import Image, ImageDraw
+
+# objects per pony in the real game
+SCALE = {
+    'houses': 0.15,
+    'shops': 0.04,
+    'hidden_ponies': 0.02,
+    'decor': 1.2,
+    'tokens': 0.04,
+    'avatars': 0.3,
+    'backgrounds': 0.05,
+    'items': 0.1,
+    'group_quests': 0.02,
+}
+
+LANGUAGES = {
+    'ENGLISH': ('Pony', 'House', 'Shop', 'Decoration', 'Token', 'Avatar', 'Background', 'Item', 'Quest'),
+    'FRENCH': ('Poney', 'Maison', 'Boutique', 'Décoration', 'Jeton', 'Avatar', 'Arrière-plan', 'Objet', 'Quête'),
+    'GERMAN': ('Pony', 'Haus', 'Laden', 'Dekoration', 'Marke', 'Avatar', 'Hintergrund', 'Gegenstand', 'Aufgabe'),
+    'SPANISH': ('Poni', 'Casa', 'Tienda', 'Decoración', 'Ficha', 'Avatar', 'Fondo', 'Objeto', 'Misión'),
+    'ITALIAN': ('Pony', 'Casa', 'Negozio', 'Decorazione', 'Gettone', 'Avatar', 'Sfondo', 'Oggetto', 'Missione'),
+    'PORTUGUESE': ('Pônei', 'Casa', 'Loja', 'Decoração', 'Ficha', 'Avatar', 'Fundo', 'Item', 'Missão'),
+    'RUSSIAN': ('Пони', 'Дом', 'Магазин', 'Украшение', 'Жетон', 'Аватар', 'Фон', 'Предмет', 'Задание'),
+    'JAPANESE': ('ポニー', 'ハウス', 'ショップ', 'デコ', 'トークン', 'アバター', '背景', 'アイテム', 'クエスト'),
+}
+WORDS = {kind: index for index, kind in enumerate(
+    ('pony', 'house', 'shop', 'decor', 'token', 'avatar', 'background', 'item', 'quest')
+)}
+
+# strings update_ponies looks up directly
+CATEGORY_STRINGS = [
+    'STR_STORE_PONIES',
+    'STR_STORE_SHOPS',
+    'STR_STORE_DECOR',
+    'STR_HELP_PONY_TASKS_TASKS',
+    'STR_GQ_ACTIVITIES_MENU_BUTTON',
+    'STR_AVATAR_ICONS',
+    'STR_STORE_BACKGROUNDS',
+]
+
+IMAGE_SIZES = {
+    'portrait': (256, 256),
+    'full': (512, 512),
+    'icon': (128, 128),
+    'background': (1024, 624),
+    'avatar': (256, 256),
+}
+# sprite atlases are a grid of icons
+ATLAS_GRID = 8
+
+PRIZE_TYPES = ['XP', 'Bits', 'Gems', 'LoyaltyShard', 'KindnessShard', 'LaughterShard', 'MinecartWheel']
+
+
+class FakeGame:
+    def __init__(
+        self,
+        folder: str,
+        ponies: int = 2000,
+        images: bool = True,
+        image_scale: float = 1,
+        pvr_ratio: float = 0.25,
+        seed: int = 0,
+    ) -> None:
+        self.folder = folder
+        self.ponies = ponies
+        self.images = images
+        self.image_scale = image_scale
+        self.pvr_ratio = pvr_ratio
+        self.random = random.Random(seed)
+
+        self.counts = {
+            name: max(1, round(ponies * scale))
+            for name, scale in SCALE.items()
+        }
+        self.counts['ponies'] = ponies
+
+        # string key -> (kind, number, is description), turned into text for every language
+        self.strings: dict[str, tuple[str, int, bool]] = {}
+        self.image_count = 0
+
+        # what was written to every .loc and .pvr file, to read them back in verify()
+        self.loc_files: dict[str, dict[str, str]] = {}
+        self.pvr_files: dict[str, tuple[tuple[int, int], int]] = {}
+
+        # sprite atlases that have been written, by folder
+        self.atlases: dict[str, list[int]] = {}
+
+    def generate(self) -> dict[str, int]:
+        """Write the whole game folder. Returns the number of each kind of object."""
+        os.makedirs(self.folder, exist_ok = True)
+
+        pony_ids = [f'Pony_Fake_{index:05}' for index in range(self.counts['ponies'])]
+        house_ids = [f'House_Fake_{index:04}' for index in range(self.counts['houses'])]
+        shop_ids = [f'Shop_Fake_{index:04}' for index in range(self.counts['shops'])]
+
+        objects = ET.Element('GameObjects')
+        shopdata = ET.Element('ShopData')
+
+        self.add_ponies(objects, shopdata, pony_ids, house_ids)
+        self.add_houses(objects, shopdata, house_ids, shop_ids, pony_ids)
+        self.add_decor(objects, shopdata)
+        self.add_tokens(objects, pony_ids)
+        self.add_avatars(objects, pony_ids)
+        self.add_backgrounds(objects)
+
+        self.write_xml('gameobjectdata.xml', objects)
+        self.write_xml('shopdata.xml', shopdata)
+
+        categories = ET.Element('GameObjectCategories')
+        for category in objects:
+            ET.SubElement(categories, 'Category', {'ID': category.get('ID')})
+        self.write_xml('gameobjectcategorydata.xml', categories)
+
+        data_version = ET.Element('DataVersion')
+        ET.SubElement(data_version, 'Version', {'Value': '1.0.0.fake'})
+        self.write_xml('data_ver.xml', data_version)
+
+        self.write_items()
+        self.write_group_quests(pony_ids)
+        self.write_campaign(pony_ids)
+
+        for key in CATEGORY_STRINGS:
+            self.add_string(key, 'item', 0)
+        self.write_loc_files()
+        self.verify()
+
+        return {**self.counts, 'images': self.image_count, 'strings': len(self.strings)}
+
+    # objects
+
+    def category(self, objects: ET.Element, name: str):
+        return ET.SubElement(objects, 'Category', {'ID': name})
+
+    def game_object(self, category: ET.Element, id: str, **components: dict):
+        element = ET.SubElement(category, 'GameObject', {'ID': id})
+        for name, attributes in components.items():
+            if not attributes:
+                continue
+            ET.SubElement(element, name, {key: str(value) for key, value in attributes.items()})
+        return element
+
+    def shop_item(self, shopdata: ET.Element, category: str, id: str):
+        element = shopdata.find(f"Category[@ID='{category}']")
+        if element is None:
+            element = ET.SubElement(shopdata, 'Category', {'ID': category})
+
+        ET.SubElement(element, 'ShopItem', {
+            'ID': id,
+            'CurrencyType': str(self.random.choice((1, 2))),
+            'Cost': str(self.random.randrange(10, 50000, 10)),
+            'UnlockValue': str(self.random.randrange(0, 120)),
+            'MapZone': str(self.random.randrange(0, 7)),
+            'TaskTokenID': '',
+        })
+
+    def add_ponies(self, objects: ET.Element, shopdata: ET.Element, pony_ids: list[str], house_ids: list[str]):
+        category = self.category(objects, 'Pony')
+
+        for index, pony_id in enumerate(pony_ids):
+            friends = ''
+            # one in ten ponies comes with a couple of friends
+            if index % 10 == 0 and index + 2 < len(pony_ids):
+                friends = ','.join(pony_ids[index + 1:index + 3])
+
+            changeling = {}
+            if index % 50 == 1:
+                changeling = {'AltPony': pony_ids[index - 1], 'IAmAlterSet': 1}
+
+            portrait = f'ui/ponies/portrait/{pony_id.lower()}'
+            full = f'ui/ponies/full/{pony_id.lower()}'
+            self.write_image(portrait, 'portrait', index, pvr = False)
+            full = self.write_image(full, 'full', index)
+
+            rewards = self.random.sample(PRIZE_TYPES, 5)
+            self.game_object(
+                category, pony_id,
+                Name = {'Unlocal': self.add_string(f'STR_{pony_id.upper()}', 'pony', index)},
+                Description = {'Unlocal': self.add_string(f'STR_{pony_id.upper()}_DESC', 'pony', index, description = True)},
+                Icon = {'Url': portrait},
+                Shop = {'Icon': full},
+                House = {'Type': house_ids[index % len(house_ids)], 'HomeMapZone': index % 7},
+                IsChangelingWithSet = changeling,
+                Friends = {'Friend': friends},
+                AI = {'Max_Level': int(index % 3 == 0)},
+                StarRewards = {
+                    'ID': ','.join(rewards),
+                    'Amount': ','.join(str(self.random.randrange(1, 100)) for _ in rewards),
+                },
+                Minigames = {
+                    'CanPlayMineCart': int(index % 4 != 0),
+                    'TimeBetweenPlayActions': self.random.randrange(60, 86400, 60),
+                    'PlayActionSkipAgainCost': self.random.randrange(1, 10),
+                    'EXP_Rank': self.random.randrange(0, 5),
+                },
+                OnArrive = {'EarnXP': self.random.randrange(10, 10000, 10)},
+            )
+            self.shop_item(shopdata, 'Pony', pony_id)
+
+        hidden = self.category(objects, 'HiddenPony')
+        for index in range(self.counts['hidden_ponies']):
+            self.game_object(
+                hidden, f'HiddenPony_Fake_{index:04}',
+                Parent = {'PonyName': pony_ids[-1 - index]},
+            )
+
+    def add_houses(
+        self,
+        objects: ET.Element,
+        shopdata: ET.Element,
+        house_ids: list[str],
+        shop_ids: list[str],
+        pony_ids: list[str],
+    ):
+        category = self.category(objects, 'Pony_House')
+        consumables = self.category(objects, 'Consumable')
+
+        for index, house_id in enumerate(house_ids + shop_ids):
+            is_shop = index >= len(house_ids)
+            icon = self.write_sprite('ui/houses', house_id.lower(), index)
+
+            components = {
+                'Name': {'Unlocal': self.add_string(f'STR_{house_id.upper()}', 'shop' if is_shop else 'house', index)},
+                'Icon': {'BookIcon': icon},
+                'Shop': {'Icon': icon},
+                'GridData': {'Size': self.random.choice((4, 6, 8, 10))},
+                'Construction': {
+                    'ConstructionTime': self.random.randrange(60, 86400, 60),
+                    'SkipCost': self.random.randrange(1, 100),
+                },
+                'XP': {
+                    'OnConstructionComplete': self.random.randrange(10, 5000, 10),
+                    'OnConstructionStarted': self.random.randrange(0, 100, 10),
+                },
+                'Visitors': {'Ponies': ','.join(self.random.sample(pony_ids, min(3, len(pony_ids))))},
+                'Sell': {'CanSell': int(index % 2 == 0)},
+            }
+
+            if is_shop:
+                consumable_id = f'Consumable_Fake_{index:04}'
+                components['ShopModule'] = {'IsAShop': 1, 'Consumable_A': consumable_id}
+
+                self.game_object(
+                    consumables, consumable_id,
+                    Name = {'Unlocal': self.add_string(f'STR_{consumable_id.upper()}', 'item', index)},
+                    Graphic = {'Sprite': self.write_sprite('ui/products', consumable_id.lower(), index)},
+                    Production = {'Time': self.random.randrange(60, 86400, 60), 'SkipCost': self.random.randrange(1, 50)},
+                    Consume = {
+                        'XP': self.random.randrange(1, 500),
+                        'SoftCoins': self.random.randrange(1, 5000),
+                        'Gems': 0,
+                    },
+                )
+
+            self.game_object(category, house_id, **components)
+            self.shop_item(shopdata, 'Pony_House', house_id)
+
+    def add_decor(self, objects: ET.Element, shopdata: ET.Element):
+        category = self.category(objects, 'Decore')
+        fusion = []
+
+        for index in range(self.counts['decor']):
+            decor_id = f'Decore_Fake_{index:05}'
+            is_pro = index % 20 == 0
+            self.game_object(
+                category, decor_id,
+                Name = {'Unlocal': self.add_string(f'STR_{decor_id.upper()}', 'decor', index)},
+                Shop = {
+                    'Icon': self.write_sprite('ui/decor', decor_id.lower(), index),
+                    'PurchaseLimit': self.random.choice((0, 0, 1, 5)),
+                },
+                GridData = {'Size': self.random.choice((2, 4, 6))},
+                OnPurchase = {'EarnXP': self.random.randrange(0, 1000, 10)},
+                ProDecoration = {
+                    'IsProDecore': int(is_pro),
+                    'GridSizeBonus': 2 if is_pro else 0,
+                    'TimeBonusPercent': 5 if is_pro else 0,
+                    'BitsBonusPercent': 5 if is_pro else 0,
+                },
+            )
+            self.shop_item(shopdata, 'Decore', decor_id)
+            fusion.append({'id': decor_id, 'val': self.random.randrange(1, 100)})
+
+        self.write_json('decoration_fusion_val.json', {'DecoreList': fusion})
+
+    def add_tokens(self, objects: ET.Element, pony_ids: list[str]):
+        category = self.category(objects, 'QuestSpecialItem')
+
+        for index in range(self.counts['tokens']):
+            token_id = f'Token_Fake_{index:04}'
+            self.game_object(
+                category, token_id,
+                QuestSpecialItem = {
+                    'Name': self.add_string(f'STR_{token_id.upper()}', 'token', index),
+                    'Icon': self.write_image(f'ui/tokens/{token_id.lower()}', 'icon', index, pvr = False),
+                    'Chance': self.random.randrange(1, 100),
+                    'PonyTasks': ','.join(self.random.sample(pony_ids, min(4, len(pony_ids)))),
+                },
+                SaveSettings = {
+                    'IsUnlimited': int(index % 5 == 0),
+                    'DisableReset': int(index % 7 == 0),
+                },
+            )
+
+    def add_avatars(self, objects: ET.Element, pony_ids: list[str]):
+        category = self.category(objects, 'ProfileAvatar')
+
+        for index in range(self.counts['avatars']):
+            avatar_id = f'ProfileAvatar_Fake_{index:04}'
+            self.game_object(
+                category, avatar_id,
+                Shop = {
+                    'Label': self.add_string(f'STR_{avatar_id.upper()}', 'avatar', index),
+                    'Icon': self.write_image(f'ui/avatars/{avatar_id.lower()}_icon', 'icon', index, pvr = False),
+                },
+                Settings = {
+                    'PictureActive': self.write_image(f'ui/avatars/{avatar_id.lower()}', 'avatar', index),
+                    'IsDefault': int(index == 0),
+                    'PonyStarsID': pony_ids[index % len(pony_ids)],
+                },
+            )
+
+    def add_backgrounds(self, objects: ET.Element):
+        category = self.category(objects, 'PlayerCardBackground')
+
+        for index in range(self.counts['backgrounds']):
+            background_id = f'PlayerCardBackground_Fake_{index:04}'
+            self.game_object(
+                category, background_id,
+                Shop = {'Label': self.add_string(f'STR_{background_id.upper()}', 'background', index)},
+                Settings = {
+                    'PictureActive': self.write_image(f'ui/backgrounds/{background_id.lower()}_preview', 'icon', index, pvr = False),
+                    'BackgroundImage': self.write_image(f'ui/backgrounds/{background_id.lower()}', 'background', index),
+                    'IsDefault': int(index == 0),
+                    'ItemID': f'Item_Fake_{index:04}',
+                },
+            )
+
+    # json files
+
+    def write_items(self):
+        prize_data = {}
+        prize_strings = {}
+        for index in range(self.counts['items']):
+            item_id = f'Item_Fake_{index:04}'
+            prize_data[item_id] = {
+                'loc_string': self.add_string(f'STR_{item_id.upper()}', 'item', index),
+                'image': self.write_image(f'ui/items/{item_id.lower()}', 'icon', index, pvr = False),
+            }
+            prize_strings[item_id] = [item_id.lower()]
+
+        self.write_json('prizetype.json', {
+            'PrizeData': prize_data,
+            'PrizeStrings': prize_strings,
+        })
+
+    def write_group_quests(self, pony_ids: list[str]):
+        quests = {}
+        pros = iter(pony_ids[::-7])
+        for index in range(self.counts['group_quests']):
+            quest_id = f'GroupQuest_Fake_{index:03}'
+            quests[quest_id] = {
+                'Name': self.add_string(f'STR_{quest_id.upper()}', 'quest', index),
+                'Description': self.add_string(f'STR_{quest_id.upper()}_DESC', 'quest', index, description = True),
+                'StoryPoints': [
+                    {'PremiumPony': next(pros, '')}
+                    for _ in range(3)
+                ],
+            }
+
+        self.write_json('groupquests.json', quests)
+
+    def write_campaign(self, pony_ids: list[str]):
+        self.write_json('defaultGameCampaign.json', {
+            'mini_games': {
+                'dailygoals': {
+                    'itemshop': [
+                        {'item_id': pony_id, 'cost': self.random.randrange(10, 500, 10)}
+                        for pony_id in pony_ids[::25]
+                    ],
+                },
+            },
+            'group_quests': {
+                'random_pros': pony_ids[1::97][:10],
+            },
+        })
+
+    # strings
+
+    def add_string(self, key: str, kind: str, number: int, description: bool = False) -> str:
+        self.strings[key] = (kind, number, description)
+        return key
+
+    def write_loc_files(self):
+        for language, words in LANGUAGES.items():
+            strings = {'DEV_ID': language}
+            for key, (kind, number, description) in self.strings.items():
+                text = f'{words[WORDS[kind]]} {number}'
+                if description:
+                    text = f'{text}: ' + ' '.join(words) * 2
+                strings[key] = text
+
+            filename = os.path.join(self.folder, f'{language.lower()}.loc')
+            write_loc(filename, strings)
+            self.loc_files[filename] = strings
+
+    def verify(self):
+        """Read every .loc and .pvr file back with luna_kit, and raise ValueError if it doesn't get back what was written."""
+        from luna_kit.loc import LOC
+        from luna_kit.pvr import PVR
+
+        for filename, strings in self.loc_files.items():
+            try:
+                loc = LOC(filename)
+            except Exception as e:
+                raise ValueError(f"luna_kit can't read {filename}: {e}") from e
+
+            wrong = [
+                key for key, text in strings.items()
+                if key not in loc or loc.translate(key) != text
+            ]
+            if wrong:
+                raise ValueError(f'luna_kit read {len(wrong)} of {len(strings)} strings in {filename} wrong, like {wrong[0]!r}')
+
+        for filename, (size, checksum) in self.pvr_files.items():
+            try:
+                image = PVR(filename, external_alpha = True).image.convert('RGBA')
+            except Exception as e:
+                raise ValueError(f"luna_kit can't read {filename}: {e}") from e
+
+            if image.size != size or zlib.crc32(image.tobytes()) != checksum:
+                raise ValueError(f"luna_kit read {filename} as a different image")
+
+    # images
+
+    def write_image(self, path: str, kind: str, number: int, pvr: bool | None = None) -> str:
+        """Write an image and return its path with the extension."""
+        if pvr is None:
+            pvr = self.random.random() < self.pvr_ratio
+
+        extension = '.pvr' if pvr else '.png'
+        if not self.images:
+            return path + extension
+
+        image = self.make_image(IMAGE_SIZES[kind], number)
+        filename = os.path.join(self.folder, path + extension)
+        os.makedirs(os.path.dirname(filename), exist_ok = True)
+        if pvr:
+            image = image.convert('RGBA')
+            write_pvr(filename, image)
+            self.pvr_files[filename] = (image.size, zlib.crc32(image.tobytes()))
+        else:
+            image.save(filename)
+
+        self.image_count += 1
+        return path + extension
+
+    def write_sprite(self, folder: str, name: str, number: int) -> str:
+        """Put an icon in a sprite atlas, and write a .sprite file for it. Returns the icon path."""
+        atlas_number, cell = divmod(number, ATLAS_GRID * ATLAS_GRID)
+        atlas = f'{os.path.basename(folder)}_atlas_{atlas_number:03}.png'
+        width, height = self.scaled(IMAGE_SIZES['icon'])
+        icon = f'{folder}/{name}.png'
+        if not self.images:
+            return icon
+
+        if atlas_number not in self.atlases.setdefault(folder, []):
+            self.atlases[folder].append(atlas_number)
+            image = Image.new('RGBA', (width * ATLAS_GRID, height * ATLAS_GRID))
+            for index in range(ATLAS_GRID * ATLAS_GRID):
+                y, x = divmod(index, ATLAS_GRID)
+                image.paste(
+                    self.make_image(IMAGE_SIZES['icon'], atlas_number * ATLAS_GRID * ATLAS_GRID + index),
+                    (x * width, y * height),
+                )
+
+            filename = os.path.join(self.folder, folder, atlas)
+            os.makedirs(os.path.dirname(filename), exist_ok = True)
+            image.save(filename)
+            self.image_count += 1
+
+        y, x = divmod(cell, ATLAS_GRID)
+        sprite = '\n'.join([
+            f'IMAGE 0x0000 "{atlas}"',
+            f'MD 0x1000 MD_IMAGE 0 {x * width} {y * height} {width} {height}',
+            f'FRAME "{name}"',
+            '{',
+            '    FM 0x1000 0 0',
+            '}',
+            '',
+        ])
+        filename = os.path.join(self.folder, folder, name + '.sprite')
+        os.makedirs(os.path.dirname(filename), exist_ok = True)
+        with open(filename, 'w', encoding = 'utf-8') as file:
+            file.write(sprite)
+
+        return icon
+    
+    def scaled(self, size: tuple[int, int]) -> tuple[int, int]:
+        return tuple(max(8, round(value * self.image_scale)) for value in size)
+
+    def make_image(self, size: tuple[int, int], number: int) -> Image.Image:
+        """Draw something with transparent space around it, so there's something to crop."""
+        width, height = self.scaled(size)
+        rng = random.Random(number)
+        image = Image.new('RGBA', (width, height))
+        draw = ImageDraw.Draw(image)
+
+        for _ in range(6):
+            x0 = rng.randrange(width // 8, width // 2)
+            y0 = rng.randrange(height // 8, height // 2)
+            x1 = rng.randrange(width // 2, width - width // 8)
+            y1 = rng.randrange(height // 2, height - height // 8)
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+            draw.ellipse((x0, y0, x1, y1), fill = color)
+
+        return image
+
+    # files
+
+    def write_xml(self, filename: str, root: ET.Element):
+        ET.indent(root)
+        ET.ElementTree(root).write(
+            os.path.join(self.folder, filename),
+            encoding = 'utf-8',
+            xml_declaration = True,
+        )
+
+    def write_json(self, filename: str, data):
+        with open(os.path.join(self.folder, filename), 'w', encoding = 'utf-8') as file:
+            json.dump(data, file, indent = 2, ensure_ascii = False)
+
+
+def write_loc(path: str, strings: dict[str, str]):
+    """Write a .loc file.
+
+    The layout is a little endian u32 string count, then every key and value
+    as a u32 byte length followed by utf-8. `FakeGame.verify` checks that
+    luna_kit reads it back.
+    """
+    with open(path, 'wb') as file:
+        file.write(struct.pack('<I', len(strings)))
+        for key, value in strings.items():
+            for text in (key, value):
+                data = text.encode('utf-8')
+                file.write(struct.pack('<I', len(data)))
+                file.write(data)
+
+
+# PVR v3 header for uncompressed RGBA8888
+PVR_VERSION = 0x03525650
+PVR_RGBA8888 = int.from_bytes(b'rgba', 'little') | (int.from_bytes(bytes((8, 8, 8, 8)), 'little') << 32)
+
+def write_pvr(path: str, image: Image.Image):
+    image = image.convert('RGBA')
+    header = struct.pack(
+        '<IIQIIIIIIIII',
+        PVR_VERSION,
+        0, # flags
+        PVR_RGBA8888,
+        0, # colour space (linear)
+        0, # channel type (unsigned byte, normalised)
+        image.height,
+        image.width,
+        1, # depth
+        1, # surfaces
+        1, # faces
+        1, # mipmaps
+        0, # metadata size
+    )
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.write(image.tobytes())
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    argparser = argparse.ArgumentParser(
+        description = 'Generate a fake game folder for update_ponies',
+    )
+
+    argparser.add_argument(
+        'folder',
+        help = 'Folder to write the game to',
+    )
+
+    argparser.add_argument(
+        '-p', '--ponies',
+        type = int,
+        default = 2000,
+        help = 'Number of ponies, everything else is scaled to match (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--no-images',
+        action = 'store_true',
+        help = "Don't write any images or sprite atlases",
+    )
+
+    argparser.add_argument(
+        '--image-scale',
+        type = float,
+        default = 1,
+        help = 'Scale the images by this much (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--pvr-ratio',
+        type = float,
+        default = 0.25,
+        help = 'Portion of the big images written as .pvr instead of .png (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--seed',
+        type = int,
+        default = 0,
+        help = 'Random seed (default: %(default)s)',
+    )
+
+    args = argparser.parse_args()
+
+    start = time.perf_counter()
+    counts = FakeGame(
+        args.folder,
+        ponies = args.ponies,
+        images = not args.no_images,
+        image_scale = args.image_scale,
+        pvr_ratio = args.pvr_ratio,
+        seed = args.seed,
+    ).generate()
+
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+    print(f'generated in {time.perf_counter() - start:.1f}s')
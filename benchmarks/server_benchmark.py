@@ -0,0 +1,369 @@
+"""
+Load test local_server.
+
+Builds a copy of the site in a temp folder, starts the server on loopback and
+replays page loads (the page, stylesheets, scripts, json and a lot of images)
+from a number of keep-alive clients at the same time.
+
+    python benchmarks/server_benchmark.py
+    python benchmarks/server_benchmark.py --engine asyncio --clients 200 --images 500
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SITE_FILES = [
+    'index.html',
+    'layout.html',
+    '404.html',
+    'app.js',
+    'site.webmanifest',
+]
+SITE_FOLDERS = [
+    'scripts',
+    'styles',
+    'assets/json',
+]
+
+
+def copy_site(folder: str, image_count: int, seed: int = 0) -> list[str]:
+    """Copy the parts of the site a page load uses into `folder`.
+
+    Only `image_count` images are copied. Returns the urls of the images.
+    """
+    for filename in SITE_FILES:
+        source = os.path.join(ROOT, filename)
+        if os.path.isfile(source):
+            shutil.copy2(source, os.path.join(folder, filename))
+
+    for name in SITE_FOLDERS:
+        source = os.path.join(ROOT, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(folder, name), dirs_exist_ok = True)
+
+    images = []
+    for root, dirs, files in os.walk(os.path.join(ROOT, 'assets', 'images')):
+        dirs.sort()
+        images.extend(os.path.join(root, filename) for filename in sorted(files) if filename.endswith('.png'))
+
+    random.Random(seed).shuffle(images)
+    images = images[:image_count]
+    if len(images) < image_count:
+        print(f'only found {len(images)} images')
+
+    urls = []
+    for source in images:
+        relative = os.path.relpath(source, ROOT)
+        destination = os.path.join(folder, relative)
+        os.makedirs(os.path.dirname(destination), exist_ok = True)
+        shutil.copy2(source, destination)
+        urls.append('/' + relative.replace(os.sep, '/'))
+
+    game_data = os.path.join(folder, 'assets', 'json', 'game-data.json')
+    if not os.path.exists(game_data):
+        # game-data.json is made by update_ponies, so make something that's about the same size
+        write_fake_game_data(game_data)
+
+    return urls
+
+
+def write_fake_game_data(path: str, ponies: int = 1500):
+    data = {'ponies': {}}
+    for index in range(ponies):
+        pony_id = f'Pony_Benchmark_{index}'
+        data['ponies'][pony_id] = {
+            'id': pony_id,
+            'name': {'english': f'Benchmark Pony {index}'},
+            'description': {'english': 'A pony that only exists for the benchmark. ' * 4},
+            'tags': ['benchmark', 'pony'],
+            'image': {
+                'portrait': f'/assets/images/ponies/portrait/{pony_id}.png',
+                'full': f'/assets/images/ponies/full/{pony_id}.png',
+            },
+        }
+
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w', encoding = 'utf-8') as file:
+        json.dump(data, file, indent = 2)
+
+
+def page_load(folder: str, images: list[str]) -> list[str]:
+    """Get the urls a browser asks for when it opens the site."""
+    urls = ['/']
+    for name in ('styles', 'scripts', 'assets/json'):
+        for root, dirs, files in os.walk(os.path.join(folder, name)):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.relpath(os.path.join(root, filename), folder)
+                urls.append('/' + path.replace(os.sep, '/'))
+
+    urls.extend(('/app.js', '/layout.html'))
+    urls.extend(images)
+    return urls
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(folder: str, engine: str, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable, os.path.join(ROOT, 'local_server.py'),
+            str(port),
+            '--bind', '127.0.0.1',
+            '--directory', folder,
+            '--engine', engine,
+            '--no-live-reload',
+        ],
+        stdout = subprocess.DEVNULL,
+        stderr = subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'{engine} server exited with code {server.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout = 0.5):
+                return server
+        except OSError:
+            time.sleep(0.05)
+
+    server.kill()
+    raise RuntimeError(f'{engine} server did not start')
+
+
+def memory_usage(pid: int) -> dict[str, int]:
+    """Get the current and peak RSS of a process in KB (Linux only)."""
+    result = {}
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    result[key] = int(value.split()[0])
+    except OSError:
+        pass
+
+    return result
+
+
+class Client:
+    """One keep-alive connection that requests urls one after the other."""
+    def __init__(self, port: int, headers: dict[str, str]) -> None:
+        self.port = port
+        self.request_headers = ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+    async def get(self, url: str) -> tuple[int, int]:
+        """Request `url` and read the whole response. Returns `(status, body size)`."""
+        if self.writer is None:
+            await self.connect()
+
+        self.writer.write(f'GET {url} HTTP/1.1\r\nHost: localhost\r\n{self.request_headers}\r\n'.encode())
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('iso-8859-1').split('\r\n')
+        status = int(lines[0].split(' ', 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        await self.reader.readexactly(length)
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        return status, length
+
+
+async def run_clients(port: int, urls: list[str], clients: int, page_loads: int, headers: dict[str, str]):
+    latencies = []
+    statuses = {}
+    errors = 0
+    transferred = 0
+
+    async def run_client(index: int):
+        nonlocal errors, transferred
+        rng = random.Random(index)
+        client = Client(port, headers)
+        try:
+            for _ in range(page_loads):
+                # the page and its scripts come first, then the images in any order
+                images = [url for url in urls if url.endswith('.png')]
+                rng.shuffle(images)
+                for url in [url for url in urls if not url.endswith('.png')] + images:
+                    start = time.perf_counter()
+                    try:
+                        status, length = await client.get(url)
+                    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                        errors += 1
+                        await client.close()
+                        continue
+
+                    latencies.append(time.perf_counter() - start)
+                    statuses[status] = statuses.get(status, 0) + 1
+                    transferred += length
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(index) for index in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'statuses': statuses,
+        'errors': errors,
+        'bytes': transferred,
+    }
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def benchmark(engine: str, folder: str, urls: list[str], args) -> dict:
+    port = free_port()
+    server = start_server(folder, engine, port)
+    try:
+        idle_memory = memory_usage(server.pid)
+        headers = {}
+        if args.gzip:
+            headers['Accept-Encoding'] = 'gzip'
+
+        result = asyncio.run(run_clients(port, urls, args.clients, args.page_loads, headers))
+        memory = memory_usage(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = result['latencies']
+    return {
+        'engine': engine,
+        'requests': len(latencies),
+        'errors': result['errors'],
+        'statuses': result['statuses'],
+        'rps': len(latencies) / result['elapsed'],
+        'mb_per_second': result['bytes'] / result['elapsed'] / 1024 / 1024,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'idle_rss': idle_memory.get('VmRSS'),
+        'rss': memory.get('VmRSS'),
+        'peak_rss': memory.get('VmHWM'),
+    }
+
+
+def print_results(results: list[dict]):
+    print(f'{"engine":<12}{"requests":>10}{"errors":>8}{"req/s":>10}{"MB/s":>8}{"p50":>10}{"p95":>10}{"p99":>10}{"peak rss":>12}')
+    for result in results:
+        peak_rss = f'{result["peak_rss"] / 1024:.1f}MB' if result['peak_rss'] else 'n/a'
+        print(
+            f'{result["engine"]:<12}{result["requests"]:>10}{result["errors"]:>8}'
+            f'{result["rps"]:>10.0f}{result["mb_per_second"]:>8.1f}'
+            f'{result["p50"]:>8.2f}ms{result["p95"]:>8.2f}ms{result["p99"]:>8.2f}ms'
+            f'{peak_rss:>12}'
+        )
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description = 'Load test local_server on loopback',
+    )
+
+    argparser.add_argument(
+        '-e', '--engine',
+        nargs = '+',
+        choices = ['threading', 'asyncio'],
+        default = ['threading', 'asyncio'],
+        help = 'Server engines to test (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '-c', '--clients',
+        type = int,
+        default = 50,
+        help = 'Concurrent keep-alive connections (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '-n', '--page-loads',
+        type = int,
+        default = 3,
+        help = 'Page loads per client (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '-i', '--images',
+        type = int,
+        default = 300,
+        help = 'Images in each page load (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--gzip',
+        action = 'store_true',
+        help = 'Send Accept-Encoding: gzip',
+    )
+
+    argparser.add_argument(
+        '--json',
+        dest = 'json_output',
+        metavar = 'FILE',
+        help = 'Also write the results to this file',
+    )
+
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix = 'server-benchmark-') as folder:
+        images = copy_site(folder, args.images)
+        urls = page_load(folder, images)
+        print(f'{len(urls)} requests per page load, {args.clients} clients, {args.page_loads} page loads each')
+
+        results = [benchmark(engine, folder, urls, args) for engine in args.engine]
+
+    print_results(results)
+
+    if args.json_output:
+        with open(args.json_output, 'w') as file:
+            json.dump(results, file, indent = 2)
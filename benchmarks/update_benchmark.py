@@ -0,0 +1,244 @@
+"""
+Run update_ponies end to end on generated game folders.
+
+Every size gets a fake game folder (see fake_game.py). Then GetGameData runs
+in its own process twice: a cold run into an empty output folder, and a
+warm run over the output of the first one, which is what a normal game
+update looks like. Wall time, the largest peak RSS of any single process in
+the run (the main process or one image worker, not their sum) and the time
+spent in each stage (from GetGameData's profile) are reported for both.
+
+    python benchmarks/update_benchmark.py
+    python benchmarks/update_benchmark.py --ponies 500 2000 10000 --json results.json
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_game import FakeGame
+
+
+def run_child(game_folder: str, work_folder: str, report: str, jobs: int | None, no_images: bool, trace_memory: bool):
+    """Runs in the child process. GetGameData writes its profile to `report`."""
+    import update_ponies
+
+    # image paths in game-data.json are relative to the working folder
+    os.chdir(work_folder)
+
+    update_ponies.GetGameData(
+        version = 'benchmark',
+        game_folder = game_folder,
+        output_folder = 'assets',
+        no_images = no_images,
+        check_wiki = False,
+        jobs = jobs,
+        wiki_cache = None,
+        profile = True,
+        profile_output = report,
+        profile_memory = trace_memory,
+    )
+
+
+def run(game_folder: str, work_folder: str, args) -> dict:
+    report = os.path.join(work_folder, 'profile.json')
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        '--child', game_folder, work_folder, report,
+    ]
+    if args.jobs:
+        command.extend(['--jobs', str(args.jobs)])
+    if args.no_images:
+        command.append('--no-images')
+    if args.trace_memory:
+        command.append('--trace-memory')
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd = ROOT, stdout = subprocess.DEVNULL if args.quiet else None)
+    # wait4 gives the largest peak RSS of any one process in this run: the
+    # child or one of its image workers, whichever was biggest, not their sum
+    pid, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+
+    if process.returncode != 0:
+        raise RuntimeError(f'update_ponies exited with code {process.returncode}')
+
+    with open(report) as file:
+        result = json.load(file)
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    max_rss = usage.ru_maxrss / 1024
+    if sys.platform == 'darwin':
+        max_rss /= 1024
+
+    return {
+        'wall': wall,
+        'max_process_rss_mb': max_rss,
+        'profile': result,
+    }
+
+
+def benchmark(ponies: int, folder: str, args) -> dict:
+    game_folder = os.path.join(folder, f'game-{ponies}')
+    work_folder = os.path.join(folder, f'output-{ponies}')
+    os.makedirs(work_folder, exist_ok = True)
+
+    print(f'generating {ponies} ponies')
+    start = time.perf_counter()
+    counts = FakeGame(
+        game_folder,
+        ponies = ponies,
+        images = not args.no_images,
+        image_scale = args.image_scale,
+    ).generate()
+    generate_time = time.perf_counter() - start
+
+    # update_ponies always starts from the existing game-data.json
+    game_data = os.path.join(work_folder, 'assets', 'json', 'game-data.json')
+    os.makedirs(os.path.dirname(game_data), exist_ok = True)
+    with open(game_data, 'w') as file:
+        file.write('{}')
+
+    print(f'cold run ({ponies} ponies)')
+    cold = run(game_folder, work_folder, args)
+    print(f'warm run ({ponies} ponies)')
+    warm = run(game_folder, work_folder, args)
+
+    return {
+        'ponies': ponies,
+        'objects': counts,
+        'generate_time': generate_time,
+        'cold': cold,
+        'warm': warm,
+    }
+
+
+def print_results(results: list[dict]):
+    print()
+    print(f'{"ponies":>8}{"images":>8}{"cold":>10}{"warm":>10}{"cold max rss":>14}{"warm max rss":>14}')
+    for result in results:
+        print(
+            f'{result["ponies"]:>8}{result["objects"]["images"]:>8}'
+            f'{result["cold"]["wall"]:>9.1f}s{result["warm"]["wall"]:>9.1f}s'
+            f'{result["cold"]["max_process_rss_mb"]:>12.0f}MB{result["warm"]["max_process_rss_mb"]:>12.0f}MB'
+        )
+
+    # every run has the same stages, but steps only show up when they happen
+    rows = {}
+    for result in results:
+        for run in ('cold', 'warm'):
+            for stage in result[run]['profile']['stages']:
+                rows.setdefault(stage['name'], None)
+                for step in stage['steps']:
+                    rows.setdefault(f'{stage["name"]}/{step}', None)
+
+    def stage_time(profile: dict, row: str):
+        name, _, step = row.partition('/')
+        for stage in profile['stages']:
+            if stage['name'] == name:
+                return stage['steps'].get(step, {}).get('wall', 0) if step else stage['wall']
+        return 0
+
+    print()
+    header = f'{"stage":<30}'
+    for result in results:
+        for run in ('cold', 'warm'):
+            header += f'{str(result["ponies"]) + " " + run:>14}'
+    print(header)
+    for row_name in rows:
+        name, _, step = row_name.partition('/')
+        row = f'{"  " + step if step else name:<30}'
+        for result in results:
+            for run in ('cold', 'warm'):
+                row += f'{stage_time(result[run]["profile"], row_name):>13.2f}s'
+        print(row)
+    print('(image steps are summed over all the image processes)')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description = 'Benchmark update_ponies on generated game folders',
+    )
+
+    argparser.add_argument(
+        '-p', '--ponies',
+        type = int,
+        nargs = '+',
+        default = [500, 2000],
+        help = 'Game sizes to test, in ponies (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '-j', '--jobs',
+        type = int,
+        default = None,
+        help = 'Image extraction processes (default: number of cpus)',
+    )
+
+    argparser.add_argument(
+        '--no-images',
+        action = 'store_true',
+        help = "Don't generate or extract any images",
+    )
+
+    argparser.add_argument(
+        '--image-scale',
+        type = float,
+        default = 1,
+        help = 'Scale the generated images by this much (default: %(default)s)',
+    )
+
+    argparser.add_argument(
+        '--keep',
+        metavar = 'FOLDER',
+        help = 'Put the game folders and output here instead of a temp folder, and keep them',
+    )
+
+    argparser.add_argument(
+        '--json',
+        dest = 'json_output',
+        metavar = 'FILE',
+        help = 'Also write the results to this file',
+    )
+
+    argparser.add_argument(
+        '--trace-memory',
+        action = 'store_true',
+        help = 'Trace memory in every stage with tracemalloc (slower)',
+    )
+
+    argparser.add_argument(
+        '-q', '--quiet',
+        action = 'store_true',
+        help = "Don't show the output of update_ponies",
+    )
+
+    argparser.add_argument('--child', nargs = 3, help = argparse.SUPPRESS)
+
+    args = argparser.parse_args()
+
+    if args.child:
+        run_child(*args.child, args.jobs, args.no_images, args.trace_memory)
+        sys.exit()
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok = True)
+        results = [benchmark(ponies, os.path.abspath(args.keep), args) for ponies in args.ponies]
+    else:
+        with tempfile.TemporaryDirectory(prefix = 'update-benchmark-') as folder:
+            results = [benchmark(ponies, folder, args) for ponies in args.ponies]
+
+    print_results(results)
+
+    if args.json_output:
+        with open(args.json_output, 'w') as file:
+            json.dump(results, file, indent = 2)
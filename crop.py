@@ -1,25 +1,99 @@
+from glob import glob
+import os
+import shutil
+import tempfile
+
 from PIL import Image
-import numpy as np
-
-def crop_image(pil_image: Image.Image):
-    # pil_image = Image.open(pil_image)
-    pil_image = pil_image.convert('RGBA')
-    np_array = np.array(pil_image)
-    blank_px = pil_image.getpixel((0,0))
-    mask = np_array != blank_px
-    mask = np.take(mask,axis=2,indices=3)
-    coords = np.argwhere(mask)
-    if 0 not in coords.shape:
-        x0, y0 = coords.min(axis=0)
-        x1, y1 = coords.max(axis=0) + 1
-        cropped_box = np_array[x0:x1, y0:y1]
-        pil_image = Image.fromarray(cropped_box, 'RGBA')
+
+def get_crop_box(pil_image: Image.Image):
+    """Get the box of everything that isn't the same alpha as the top left pixel."""
+    alpha = pil_image.getchannel('A')
+    blank_alpha = alpha.getpixel((0, 0))
+
+    if blank_alpha != 0:
+        alpha = alpha.point([0 if value == blank_alpha else 255 for value in range(256)])
+    
+    return alpha.getbbox() or (0, 0, *pil_image.size)
+
+def crop_image(pil_image: Image.Image, return_box: bool = False):
+    """Crop off the border around an image.
+
+    The border is anything with the same alpha as the top left pixel. If
+    `return_box` is True, `(image, box)` is returned, where `box` is the
+    `(left, top, right, bottom)` that was kept. Images that are already
+    tight are returned as is, without being copied.
+    """
+    if pil_image.mode != 'RGBA':
+        pil_image = pil_image.convert('RGBA')
     
+    box = get_crop_box(pil_image)
+    if box != (0, 0, *pil_image.size):
+        pil_image = pil_image.crop(box)
+    
+    if return_box:
+        return pil_image, box
     return pil_image
 
+def crop_file(filename: str, skip_tight: bool = False):
+    """Crop an image file in place.
+
+    The cropped image is written to a temporary file next to the original and
+    then renamed over it, so a failed write never leaves a truncated image.
+    Returns `(status, error)`, where status is 'processed', 'skipped' or
+    'failed'.
+    """
+    try:
+        image = Image.open(filename)
+        image_format = image.format
+        original_size = image.size
+        image, box = crop_image(image, return_box = True)
+
+        if skip_tight and box == (0, 0, *original_size):
+            return 'skipped', None
+
+        fd, temp_filename = tempfile.mkstemp(
+            prefix = '.' + os.path.basename(filename) + '.',
+            suffix = '.tmp',
+            dir = os.path.dirname(filename) or '.',
+        )
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                image.save(file, format = image_format)
+            # mkstemp makes the file 0600, so keep the original permissions
+            shutil.copymode(filename, temp_filename)
+            os.replace(temp_filename, filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+    except Exception as e:
+        return 'failed', f'{type(e).__name__}: {e}'
+    
+    return 'processed', None
+
+IMAGE_EXTENSIONS = ('.png', '.webp', '.gif', '.tga')
+
+def find_files(patterns: list[str]):
+    files: list[str] = []
+
+    for pattern in patterns:
+        for path in glob(pattern, recursive = True):
+            if os.path.isdir(path):
+                for root, dirs, filenames in os.walk(path):
+                    files.extend(
+                        os.path.join(root, filename)
+                        for filename in sorted(filenames)
+                        if filename.lower().endswith(IMAGE_EXTENSIONS)
+                    )
+            else:
+                files.append(path)
+    
+    return list(dict.fromkeys(files))
+
 if __name__ == "__main__":
     import argparse
-    from glob import glob
+    from concurrent.futures import ProcessPoolExecutor
+    import functools
+    import time
 
     argparser = argparse.ArgumentParser(
         description = 'Crop images'
@@ -28,24 +102,61 @@ if __name__ == "__main__":
     argparser.add_argument(
         'files',
         nargs = '+',
-        help = 'Input file(s) to crop',
+        help = 'Input file(s) or folder(s) to crop. Folders are searched for images recursively',
+    )
+
+    argparser.add_argument(
+        '-j', '--jobs',
+        type = int,
+        default = None,
+        help = 'Number of processes to crop with (default: number of cpus)',
+    )
+
+    argparser.add_argument(
+        '-s', '--skip-tight',
+        action = 'store_true',
+        help = "Don't rewrite images that are already cropped",
     )
 
     args = argparser.parse_args()
 
-    files: list[str] = []
+    if args.jobs is not None and args.jobs < 1:
+        argparser.error(f'argument -j/--jobs: must be at least 1, not {args.jobs}')
 
-    for file in args.files:
-        files.extend(glob(file))
+    files = find_files(args.files)
 
     if len(files) == 0:
         print('no files to crop')
     
-    for file in files:
-        try:
-            image = Image.open(file)
-            image = crop_image(image)
-            image.save(file)
-        except Exception as e:
-            print(e)
+    jobs = args.jobs if args.jobs is not None else os.cpu_count() or 1
+    counts = {
+        'processed': 0,
+        'skipped': 0,
+        'failed': 0,
+    }
 
+    start = time.perf_counter()
+    crop = functools.partial(crop_file, skip_tight = args.skip_tight)
+
+    if jobs <= 1 or len(files) <= 1:
+        results = map(crop, files)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers = jobs)
+        results = executor.map(crop, files, chunksize = max(1, min(64, len(files) // (jobs * 4))))
+    
+    try:
+        for file, (status, error) in zip(files, results):
+            counts[status] += 1
+            if error is not None:
+                print(f'{file}: {error}')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    elapsed = time.perf_counter() - start
+    if files:
+        print(
+            f'{counts["processed"]} processed, {counts["skipped"]} skipped, {counts["failed"]} failed '
+            f'in {elapsed:.2f}s ({len(files) / elapsed if elapsed else 0:.0f} files/s)'
+        )
@@ -1,14 +1,32 @@
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer, test
 from http import HTTPStatus
+import asyncio
+import bisect
+from collections import OrderedDict
+from concurrent.futures import Future
+import contextlib
+import functools
 import html
+import json
 import os
 import io
+import queue
 import socket
-from datetime import datetime
+from datetime import datetime, timezone
+import email.utils
+import gzip
 import re
+import threading
+import time
+from typing import Callable
 
 import lxml.html
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 from urllib.parse import urlparse, parse_qsl, urlencode
 import urllib.parse
 
@@ -17,8 +35,90 @@ import urllib.parse
 looks_like_full_html = re.compile(
     br'^\s*<(?:html|!doctype)', re.I).match
 
-def fix_html(source: bytes):
-    now = datetime.now().timestamp()
+RANGE_PATTERN = re.compile(r'bytes=(?P<start>\d*)-(?P<end>\d*)')
+
+# types that are worth compressing
+COMPRESSIBLE_TYPES = {
+    'application/javascript',
+    'application/json',
+    'application/manifest+json',
+    'application/xml',
+    'image/svg+xml',
+}
+# files smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+def is_compressible(ctype: str) -> bool:
+    # pages are rewritten for every request, so they're not compressed
+    if ctype == 'text/html':
+        return False
+    return ctype.startswith('text/') or ctype in COMPRESSIBLE_TYPES
+
+def compress_gzip(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return gzip.compress(file.read(), compresslevel = 6, mtime = 0)
+
+def compress_brotli(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return brotli.compress(file.read(), quality = 5)
+
+# in order of preference
+COMPRESSORS: dict[str, Callable[[str], bytes]] = {}
+if brotli is not None:
+    COMPRESSORS['br'] = compress_brotli
+COMPRESSORS['gzip'] = compress_gzip
+
+COMPRESSED_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Parse Accept-Encoding into a dict of encoding to quality."""
+    accepted = {}
+    for item in header.split(','):
+        encoding, *params = item.split(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[encoding] = quality
+    
+    return accepted
+
+# fix_html puts this in place of the timestamp for cached pages, and it gets
+# swapped for the current time whenever the page is sent
+NOCACHE_PLACEHOLDER = 'NOCACHE_PLACEHOLDER_'
+NOCACHE_PATTERN = re.compile(re.escape(NOCACHE_PLACEHOLDER.encode()) + rb'([0-9a-f]*)_')
+
+LIVE_RELOAD_PATH = '/__livereload'
+LIVE_RELOAD_SCRIPT = f'''<script>
+new EventSource('{LIVE_RELOAD_PATH}').addEventListener('change', () => location.reload())
+</script>'''
+# how often to send something to event streams, so closed connections get noticed
+EVENT_PING_INTERVAL = 15
+
+def fix_html(
+    source: bytes,
+    nocache: str | Callable[[str], str | None] | None = None,
+    live_reload: bool = False,
+):
+    """Add a nocache parameter to every stylesheet and script.
+
+    `nocache` is the value to use for every link, or a function that gets the
+    url and returns the value, or `None` to leave that link alone. It defaults
+    to the current time. `live_reload` adds the live reload client to full pages.
+    """
+    if nocache is None:
+        nocache = str(datetime.now().timestamp())
     
     root: list[str | lxml.html.HtmlElement] = []
 
@@ -42,12 +142,22 @@ def fix_html(source: bytes):
             elif link_element.tag == 'script':
                 attr = 'src'
             
-            url = urlparse(link_element.get(attr, ''))
+            href = link_element.get(attr, '')
+            value = nocache(href) if callable(nocache) else nocache
+            if value is None:
+                continue
+            
+            url = urlparse(href)
             query = parse_qsl(url.query)
-            query.append(('nocache', str(now)))
+            query.append(('nocache', str(value)))
             url = url._replace(query = urlencode(query))
             link_element.set(attr, url.geturl())
     
+    if is_full and live_reload:
+        body = root[0].find('body')
+        if body is not None:
+            body.append(lxml.html.fragment_fromstring(LIVE_RELOAD_SCRIPT))
+    
     result = b''
     for element in root:
         if isinstance(element, str):
@@ -62,10 +172,365 @@ def fix_html(source: bytes):
     return result
 
 
+class ResponseCache:
+    """LRU cache of processed file contents.
+
+    Entries are keyed by path and thrown out when the file's mtime or size
+    changes. The cache is limited to `max_size` bytes. If a few threads ask
+    for the same file that isn't cached yet, only one of them loads it and
+    the rest wait for that result.
+    """
+    def __init__(self, max_size: int = 64 * 1024 * 1024) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.entries: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self.loading: dict[tuple[str, tuple[int, int]], Future] = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, load: Callable[[str], bytes], name: str | None = None) -> tuple[bytes, bool]:
+        """Get the contents of `path`, using `load` if it's not cached. Returns `(body, hit)`.
+
+        `name` is the cache key, for when there's more than one version of a file
+        (like compressed ones). It defaults to `path`.
+        """
+        if name is None:
+            name = path
+        
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (name, version)
+
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(name)
+                self.hits += 1
+                return entry[1], True
+            
+            future = self.loading.get(key)
+            if future is not None:
+                # someone else is already loading it
+                self.hits += 1
+                wait = True
+            else:
+                self.misses += 1
+                future = self.loading[key] = Future()
+                wait = False
+        
+        if wait:
+            return future.result(), True
+        
+        try:
+            body = load(path)
+        except BaseException as e:
+            future.set_exception(e)
+            with self.lock:
+                self.loading.pop(key, None)
+            raise
+        
+        # cache it and hand it to the waiting threads before it stops being
+        # loaded, so there's no gap where someone would load it again
+        self.add(name, version, body)
+        future.set_result(body)
+        with self.lock:
+            self.loading.pop(key, None)
+        return body, False
+
+    def peek(self, path: str, name: str | None = None) -> bytes | None:
+        """Get the contents of `path` if they're cached and current, without loading them."""
+        if name is None:
+            name = path
+        
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        return None
+
+    def add(self, path: str, version: tuple[int, int], body: bytes):
+        if len(body) > self.max_size:
+            return
+        
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= len(old[1])
+            
+            self.entries[path] = (version, body)
+            self.size += len(body)
+
+            while self.size > self.max_size:
+                old_version, old_body = self.entries.popitem(last = False)[1]
+                self.size -= len(old_body)
+
+
+METRICS_PATH = '/__metrics'
+
+
+class Histogram:
+    """Latency histogram with Prometheus style buckets (in seconds)."""
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        # the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def cumulative(self) -> list[tuple[str, int]]:
+        result = []
+        total = 0
+        for bucket, count in zip([*self.buckets, '+Inf'], self.counts):
+            total += count
+            result.append((str(bucket), total))
+        return result
+    
+    def to_json(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(self.cumulative()),
+        }
+
+
+class Metrics:
+    """Request counters and latency histograms for the server."""
+    PHASES = ('read', 'rewrite', 'send')
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+        self.requests: dict[tuple[int, str], int] = {}
+        self.response_bytes: dict[str, int] = {}
+        self.duration = Histogram()
+        self.phases = {phase: Histogram() for phase in self.PHASES}
+        self.slow_requests = 0
+    
+    def record(
+        self,
+        status: int,
+        ctype: str,
+        size: int,
+        duration: float,
+        timings: dict[str, float],
+        slow: bool = False,
+    ):
+        with self.lock:
+            key = (status, ctype)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.response_bytes[ctype] = self.response_bytes.get(ctype, 0) + size
+            self.duration.observe(duration)
+            for phase, seconds in timings.items():
+                self.phases[phase].observe(seconds)
+            if slow:
+                self.slow_requests += 1
+    
+    def to_json(self, cache: ResponseCache | None = None) -> dict:
+        with self.lock:
+            result = {
+                'uptime': time.time() - self.started,
+                'requests': [
+                    {'status': status, 'content_type': ctype, 'count': count}
+                    for (status, ctype), count in sorted(self.requests.items())
+                ],
+                'response_bytes': dict(sorted(self.response_bytes.items())),
+                'duration': self.duration.to_json(),
+                'phases': {phase: histogram.to_json() for phase, histogram in self.phases.items()},
+                'slow_requests': self.slow_requests,
+            }
+        
+        if cache is not None:
+            result['response_cache'] = {
+                'hits': cache.hits,
+                'misses': cache.misses,
+                'entries': len(cache.entries),
+                'bytes': cache.size,
+                'max_bytes': cache.max_size,
+            }
+        
+        return result
+    
+    def to_prometheus(self, cache: ResponseCache | None = None) -> str:
+        lines = []
+
+        def add_histogram(name: str, histogram: Histogram, labels: str = ''):
+            for bucket, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{{labels}le="{bucket}"}} {count}')
+            labels = '{' + labels.rstrip(',') + '}' if labels else ''
+            lines.append(f'{name}_sum{labels} {histogram.sum}')
+            lines.append(f'{name}_count{labels} {histogram.count}')
+        
+        with self.lock:
+            lines.append('# HELP local_server_requests_total Requests by status code and content type.')
+            lines.append('# TYPE local_server_requests_total counter')
+            for (status, ctype), count in sorted(self.requests.items()):
+                lines.append(f'local_server_requests_total{{status="{status}",content_type="{ctype}"}} {count}')
+            
+            lines.append('# HELP local_server_response_bytes_total Bytes sent in response bodies by content type.')
+            lines.append('# TYPE local_server_response_bytes_total counter')
+            for ctype, size in sorted(self.response_bytes.items()):
+                lines.append(f'local_server_response_bytes_total{{content_type="{ctype}"}} {size}')
+            
+            lines.append('# HELP local_server_request_duration_seconds Time to handle a request.')
+            lines.append('# TYPE local_server_request_duration_seconds histogram')
+            add_histogram('local_server_request_duration_seconds', self.duration)
+
+            lines.append('# HELP local_server_phase_duration_seconds Time spent reading, rewriting and sending.')
+            lines.append('# TYPE local_server_phase_duration_seconds histogram')
+            for phase, histogram in self.phases.items():
+                add_histogram('local_server_phase_duration_seconds', histogram, f'phase="{phase}",')
+            
+            lines.append('# HELP local_server_slow_requests_total Requests slower than the slow request threshold.')
+            lines.append('# TYPE local_server_slow_requests_total counter')
+            lines.append(f'local_server_slow_requests_total {self.slow_requests}')
+        
+        if cache is not None:
+            lines.append('# TYPE local_server_response_cache_hits_total counter')
+            lines.append(f'local_server_response_cache_hits_total {cache.hits}')
+            lines.append('# TYPE local_server_response_cache_misses_total counter')
+            lines.append(f'local_server_response_cache_misses_total {cache.misses}')
+            lines.append('# TYPE local_server_response_cache_bytes gauge')
+            lines.append(f'local_server_response_cache_bytes {cache.size}')
+        
+        return '\n'.join(lines) + '\n'
+
+
+def file_version(path: str) -> str:
+    """Get the version used to cache bust a file, which changes whenever the file does."""
+    try:
+        return f'{os.stat(path).st_mtime_ns:x}'
+    except OSError:
+        return '0'
+
+
+def format_event(version: int, changed: list[str]) -> bytes:
+    data = json.dumps({'version': version, 'changed': changed})
+    return f'event: change\ndata: {data}\n\n'.encode()
+
+
+class FileWatcher:
+    """Watch a directory for changes by polling it.
+
+    Callbacks passed to `subscribe` get called from the watcher thread with the
+    list of changed files (as urls), whenever something changes.
+    """
+    IGNORE = {'.git', '__pycache__', 'node_modules'}
+
+    def __init__(self, directory: str, interval: float = 1) -> None:
+        self.directory = os.fspath(directory)
+        self.interval = interval
+        self.version = 0
+        self.files: dict[str, int] = {}
+        self.subscribers: list[Callable[[list[str]], None]] = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def scan(self) -> dict[str, int]:
+        files = {}
+        folders = [self.directory]
+        while folders:
+            try:
+                entries = list(os.scandir(folders.pop()))
+            except OSError:
+                continue
+            
+            for entry in entries:
+                # hidden files, plus the temp files update_ponies writes
+                if entry.name.startswith('.') or entry.name.endswith('.tmp'):
+                    continue
+                if entry.name in self.IGNORE:
+                    continue
+                
+                try:
+                    if entry.is_dir(follow_symlinks = False):
+                        folders.append(entry.path)
+                    else:
+                        files[entry.path] = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+        
+        return files
+    
+    def check(self) -> list[str]:
+        """Scan the directory, and tell the subscribers if anything changed."""
+        files = self.scan()
+        changed = sorted(
+            path for path in files.keys() | self.files.keys()
+            if files.get(path) != self.files.get(path)
+        )
+        self.files = files
+        if not changed:
+            return changed
+        
+        urls = [
+            '/' + os.path.relpath(path, self.directory).replace(os.sep, '/')
+            for path in changed
+        ]
+        with self.lock:
+            self.version += 1
+            subscribers = list(self.subscribers)
+        
+        for callback in subscribers:
+            callback(urls)
+        
+        return urls
+    
+    def subscribe(self, callback: Callable[[list[str]], None]) -> Callable[[], None]:
+        """Call `callback` with the changed files. Returns a function to unsubscribe."""
+        with self.lock:
+            self.subscribers.append(callback)
+        
+        def unsubscribe():
+            with self.lock:
+                if callback in self.subscribers:
+                    self.subscribers.remove(callback)
+        
+        return unsubscribe
+
+    def start(self):
+        self.files = self.scan()
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
     
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
 
 
 class HTTPServer(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # close idle keep-alive connections instead of keeping their threads around
+    timeout = 60
+    # the headers and the body are sent separately, so without this, Nagle's
+    # algorithm holds the body back until the headers get acked
+    disable_nagle_algorithm = True
+
+    response_cache = ResponseCache()
+    cache_status = None
+    # set this to a started FileWatcher to turn on live reload
+    watcher: FileWatcher | None = None
+
+    metrics = Metrics()
+    # log requests that take longer than this many milliseconds
+    slow_request_threshold: float | None = None
+    request_start: float | None = None
+    body_range: tuple[int, int] | None = None
+
+
     def send_head(self):
         """Common code for GET and HEAD commands.
 
@@ -80,6 +545,17 @@ class HTTPServer(SimpleHTTPRequestHandler):
         
         self.extensions_map['.js'] = 'text/javascript'
         
+        self.cache_status = None
+        self.body_range = None
+        
+        if self.is_live_reload():
+            self.send_event_headers()
+            return None
+        
+        url_path = urllib.parse.urlsplit(self.path).path
+        if url_path in (METRICS_PATH, METRICS_PATH + '.json'):
+            return self.send_metrics(url_path.endswith('.json'))
+        
         path = self.translate_path(self.path)
         f = None
         if os.path.isdir(path):
@@ -110,24 +586,288 @@ class HTTPServer(SimpleHTTPRequestHandler):
         if path.endswith("/"):
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
             return None
+        if ctype == 'text/html':
+            return self.send_page(path, ctype)
+        
         try:
-            f = self.get_file(path)
-            length = len(f.read())
-            f.seek(0)
+            with self.timed('read'):
+                f = open(path, 'rb')
+                fs = os.fstat(f.fileno())
         except OSError:
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
             return None
 
         try:
+            encoding = self.choose_encoding(ctype, fs.st_size)
+            compressed_length = None
+            if encoding is not None and self.command == 'HEAD':
+                # HEAD never reads the body, so only say it's compressed if
+                # the compressed length is already known
+                compressed_length = self.compressed_length(path, fs, encoding)
+                if compressed_length is None:
+                    encoding = None
+            
+            etag, last_modified = self.file_validators(fs, encoding)
+            cache_control = self.cache_control(fs)
+
+            if self.is_not_modified(etag, fs):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_vary(ctype)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                f.close()
+                return None
+            
+            if encoding is not None:
+                if compressed_length is not None:
+                    length = compressed_length
+                else:
+                    body, length = self.get_compressed(path, fs, encoding)
+                    f.close()
+                    f = body
 
-            self.send_response(HTTPStatus.OK)
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-type", ctype)
+                self.send_header("Content-Length", str(length))
+                self.send_header("Content-Encoding", encoding)
+                self.send_vary(ctype)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                return f
+            
+            size = fs.st_size
+            byte_range = None
+            if self.if_range_matches(etag, fs):
+                byte_range = self.parse_range(size)
+            
+            if byte_range == 'invalid':
+                f.close()
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            
+            if byte_range is None:
+                self.send_response(HTTPStatus.OK)
+                length = size
+            else:
+                start, end = byte_range
+                length = end - start + 1
+                self.body_range = (start, length)
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            
             self.send_header("Content-type", ctype)
             self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_vary(ctype)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", cache_control)
             self.end_headers()
             return f
         except:
             f.close()
             raise
+    
+    def send_page(self, path: str, ctype: str):
+        """Send a page that fix_html rewrites.
+
+        Pages come from the response cache and get a new nocache timestamp
+        every time, so they're never given validators.
+        """
+        try:
+            f = self.get_file(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", ctype)
+        self.send_header("Content-Length", str(len(f.getbuffer())))
+        self.end_headers()
+        return f
+    
+    def file_validators(self, fs: os.stat_result, encoding: str | None = None) -> tuple[str, str]:
+        """Get the strong ETag and the Last-Modified date for a file.
+
+        Every encoding of a file gets its own ETag, since they're different bytes.
+        """
+        etag = f'{fs.st_mtime_ns:x}-{fs.st_size:x}'
+        if encoding is not None:
+            etag += f'-{encoding}'
+        etag = f'"{etag}"'
+        last_modified = self.date_time_string(fs.st_mtime)
+        return etag, last_modified
+    
+    def is_not_modified(self, etag: str, fs: os.stat_result) -> bool:
+        """Check If-None-Match, or If-Modified-Since if there isn't one."""
+        if self.command not in ('GET', 'HEAD'):
+            return False
+        
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            # If-None-Match uses the weak comparison
+            tags = [tag.removeprefix('W/') for tag in tags]
+            return '*' in tags or etag in tags
+        
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, IndexError, OverflowError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo = timezone.utc)
+            
+            # Last-Modified only has whole seconds
+            return int(fs.st_mtime) <= since.timestamp()
+        
+        return False
+    
+    def cache_control(self, fs: os.stat_result) -> str:
+        """Files requested with their current version (see `file_version`) never
+        change, so the browser can keep them. Anything else has to be revalidated."""
+        query = parse_qsl(urllib.parse.urlsplit(self.path).query)
+        if ('nocache', f'{fs.st_mtime_ns:x}') in query:
+            return 'max-age=31536000, immutable'
+        return 'no-cache'
+    
+    def choose_encoding(self, ctype: str, size: int) -> str | None:
+        """Pick the best encoding from Accept-Encoding, or `None` to send the file as is.
+
+        Range requests always get the plain file, so the ranges match up with it.
+        """
+        if not is_compressible(ctype) or size < COMPRESS_MIN_SIZE:
+            return None
+        if 'Range' in self.headers:
+            return None
+        
+        accepted = parse_accept_encoding(self.headers.get('Accept-Encoding', ''))
+
+        best = None
+        best_quality = 0
+        for encoding in COMPRESSORS:
+            quality = accepted.get(encoding, accepted.get('*', 0))
+            if quality > best_quality:
+                best = encoding
+                best_quality = quality
+        
+        return best
+    
+    def get_compressed(self, path: str, fs: os.stat_result, encoding: str) -> tuple[io.IOBase, int]:
+        """Get the compressed file and its length.
+
+        A precompressed file next to the original (`file.json.gz`) is used if it's
+        at least as new as the original. Otherwise the file gets compressed once and
+        kept in the response cache.
+        """
+        try:
+            f = open(path + COMPRESSED_SUFFIXES[encoding], 'rb')
+        except OSError:
+            pass
+        else:
+            compressed_fs = os.fstat(f.fileno())
+            if compressed_fs.st_mtime_ns >= fs.st_mtime_ns:
+                self.cache_status = 'precompressed'
+                return f, compressed_fs.st_size
+            f.close()
+        
+        with self.timed('rewrite'):
+            body, hit = self.response_cache.get(
+                path,
+                COMPRESSORS[encoding],
+                name = f'{path}:{encoding}',
+            )
+        self.cache_status = 'hit' if hit else 'miss'
+        return io.BytesIO(body), len(body)
+    
+    def compressed_length(self, path: str, fs: os.stat_result, encoding: str) -> int | None:
+        """Get the length of the compressed file without compressing it.
+
+        Returns `None` if there's no precompressed file that's new enough and
+        it isn't in the response cache.
+        """
+        try:
+            compressed_fs = os.stat(path + COMPRESSED_SUFFIXES[encoding])
+        except OSError:
+            pass
+        else:
+            if compressed_fs.st_mtime_ns >= fs.st_mtime_ns:
+                self.cache_status = 'precompressed'
+                return compressed_fs.st_size
+        
+        body = self.response_cache.peek(path, f'{path}:{encoding}')
+        if body is None:
+            return None
+        
+        self.cache_status = 'hit'
+        return len(body)
+    
+    def send_vary(self, ctype: str):
+        if is_compressible(ctype):
+            self.send_header("Vary", "Accept-Encoding")
+    
+    def if_range_matches(self, etag: str, fs: os.stat_result) -> bool:
+        """Check If-Range. A range is only sent if the file hasn't changed."""
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        
+        if_range = if_range.strip()
+        if if_range.startswith(('"', 'W/')):
+            # If-Range uses the strong comparison
+            return if_range == etag
+        
+        try:
+            date = email.utils.parsedate_to_datetime(if_range)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if date.tzinfo is None:
+            date = date.replace(tzinfo = timezone.utc)
+        return int(fs.st_mtime) == date.timestamp()
+    
+    def parse_range(self, size: int) -> tuple[int, int] | str | None:
+        """Parse the Range header.
+
+        Returns `(start, end)` (inclusive) for a single satisfiable range,
+        `'invalid'` if it can't be satisfied, and `None` if the whole file
+        should be sent instead (no header, a header we don't understand, or
+        several ranges).
+        """
+        header = self.headers.get('Range')
+        if header is None:
+            return None
+        
+        match = RANGE_PATTERN.fullmatch(header.strip())
+        if match is None:
+            return None
+        
+        start, end = match.group('start'), match.group('end')
+        if start == '':
+            if end == '':
+                return None
+            # suffix range, the last n bytes
+            length = int(end)
+            if length == 0 or size == 0:
+                return 'invalid'
+            return max(size - length, 0), size - 1
+        
+        start = int(start)
+        if end != '' and int(end) < start:
+            # not a valid range, so it's ignored
+            return None
+        if start >= size:
+            return 'invalid'
+        
+        end = size - 1 if end == '' else min(int(end), size - 1)
+        return start, end
 
     def send_error(self, code: int, message: str | None = None, explain: str | None = None) -> None:
         # return super().send_error(code, message, explain)
@@ -143,16 +883,21 @@ class HTTPServer(SimpleHTTPRequestHandler):
         if explain is None:
             explain = longmsg
         self.log_error("code %d, message %s", code, message)
-        self.send_response(code, message)
-        self.send_header('Connection', 'close')
 
-        
+        # load the 404 page before sending the response so the log line
+        # knows whether it came from the cache
         body = None
         if code == 404:
             path = self.translate_path('/404.html')
             ctype = self.guess_type(path)
-
             body = self.get_file(path).read()
+
+        self.send_response(code, message)
+        if code != 404:
+            self.send_header('Connection', 'close')
+
+        
+        if code == 404:
             self.send_header("Content-Type", ctype)
             self.send_header('Content-Length', str(len(body)))
 
@@ -182,21 +927,392 @@ class HTTPServer(SimpleHTTPRequestHandler):
     def get_file(self, filename: str):
         ctype = self.guess_type(filename)
 
-        result = b''
+        result, hit = self.response_cache.get(filename, self.load_file)
+        self.cache_status = 'hit' if hit else 'miss'
 
         if ctype == 'text/html':
-            with open(filename, 'rb') as file:
-                result = fix_html(file.read())
-        else:
+            # the placeholders have the file path, so the version is always current
+            with self.timed('rewrite'):
+                result = NOCACHE_PATTERN.sub(
+                    lambda match: file_version(bytes.fromhex(match[1].decode()).decode()).encode(),
+                    result,
+                )
+        
+        return io.BytesIO(result)
+    
+    def load_file(self, filename: str) -> bytes:
+        ctype = self.guess_type(filename)
+
+        with self.timed('read'):
             with open(filename, 'rb') as file:
                 result = file.read()
         
-        return io.BytesIO(result)
+        if ctype == 'text/html':
+            with self.timed('rewrite'):
+                result = fix_html(
+                    result,
+                    functools.partial(self.version_placeholder, filename),
+                    live_reload = self.watcher is not None,
+                )
+        
+        return result
+    
+    def version_placeholder(self, page: str, href: str) -> str | None:
+        """Get the placeholder for the version of the file `href` points to.
+
+        Links to other sites are left alone.
+        """
+        url = urllib.parse.urlsplit(href)
+        if url.scheme or url.netloc or not url.path:
+            return None
+        
+        if url.path.startswith('/'):
+            path = self.translate_path(url.path)
+        else:
+            path = os.path.join(os.path.dirname(page), urllib.parse.unquote(url.path))
+        
+        return NOCACHE_PLACEHOLDER + os.path.normpath(path).encode().hex() + '_'
+    
+    def is_live_reload(self) -> bool:
+        return self.watcher is not None and urllib.parse.urlsplit(self.path).path == LIVE_RELOAD_PATH
+    
+    def send_event_headers(self):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+    
+    def do_GET(self):
+        f = self.send_head()
+        if f is None and self.is_live_reload():
+            self.send_events()
+            return
+        if f:
+            try:
+                with self.timed('send'):
+                    self.copyfile(f, self.wfile)
+            finally:
+                f.close()
+    
+    def send_events(self):
+        """Send change events to the client until it goes away."""
+        events = queue.Queue()
+        unsubscribe = self.watcher.subscribe(events.put)
+        try:
+            while True:
+                try:
+                    changed = events.get(timeout = EVENT_PING_INTERVAL)
+                    message = format_event(self.watcher.version, changed)
+                except queue.Empty:
+                    message = b': ping\n\n'
+                self.wfile.write(message)
+        except OSError:
+            pass
+        finally:
+            unsubscribe()
+            # event streams stay open for as long as the page does, which
+            # would throw off the timings
+            self.request_start = None
+    
+    def copyfile(self, source, outputfile):
+        """Copy the body to the client.
+
+        Real files are sent with `socket.sendfile`, which uses `os.sendfile`
+        where it can and falls back to sending it in chunks, so the file
+        never has to be read into memory.
+        """
+        if isinstance(source, io.BytesIO):
+            return super().copyfile(source, outputfile)
+        
+        outputfile.flush()
+        if self.body_range is None:
+            self.connection.sendfile(source)
+        else:
+            offset, count = self.body_range
+            self.connection.sendfile(source, offset, count)
+    
+    def send_metrics(self, as_json: bool):
+        if as_json:
+            body = json.dumps(self.metrics.to_json(self.response_cache), indent = 2).encode()
+            ctype = 'application/json'
+        else:
+            body = self.metrics.to_prometheus(self.response_cache).encode()
+            ctype = 'text/plain; version=0.0.4'
+        
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return io.BytesIO(body)
+    
+    @contextlib.contextmanager
+    def timed(self, phase: str):
+        """Add the time spent in this block to `phase` in the request timings."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(phase, time.perf_counter() - start)
+    
+    def add_timing(self, phase: str, seconds: float):
+        # the request timings don't exist outside of a request
+        timings = getattr(self, 'timings', None)
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0) + seconds
+    
+    def parse_request(self) -> bool:
+        self.request_start = time.perf_counter()
+        self.timings = {}
+        self.response_status = None
+        self.response_type = ''
+        self.response_length = 0
+        return super().parse_request()
+    
+    def handle_one_request(self):
+        self.request_start = None
+        super().handle_one_request()
+        if self.request_start is not None:
+            self.record_metrics()
+    
+    def send_response_only(self, code, message = None):
+        self.response_status = int(code)
+        super().send_response_only(code, message)
+    
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-type':
+            self.response_type = value.split(';')[0].strip()
+        elif keyword.lower() == 'content-length':
+            self.response_length = int(value)
+        super().send_header(keyword, value)
+    
+    def record_metrics(self):
+        """Record the finished request, and log it if it was slow."""
+        duration = time.perf_counter() - self.request_start
+        self.request_start = None
+
+        size = self.response_length
+        if self.command == 'HEAD' or self.response_status == HTTPStatus.NOT_MODIFIED:
+            size = 0
+        
+        slow = (
+            self.slow_request_threshold is not None
+            and duration * 1000 >= self.slow_request_threshold
+        )
+        self.metrics.record(
+            self.response_status or 0,
+            self.response_type,
+            size,
+            duration,
+            self.timings,
+            slow,
+        )
+
+        if slow:
+            phases = ', '.join(
+                f'{phase} {self.timings.get(phase, 0) * 1000:.1f} ms'
+                for phase in Metrics.PHASES
+            )
+            self.log_message('slow request "%s" took %.1f ms (%s)',
+                             self.requestline, duration * 1000, phases)
+    
+    def log_request(self, code = '-', size = '-'):
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        
+        cache = ''
+        if self.cache_status is not None:
+            cache = f' [cache {self.cache_status}, {self.response_cache.hits} hits, {self.response_cache.misses} misses]'
+        
+        self.log_message('"%s" %s %s%s',
+                         self.requestline, str(code), str(size), cache)
+
+
+class AsyncRequestHandler(HTTPServer):
+    """Handles a single request for the asyncio server.
+
+    This works just like `HTTPServer`, except that it doesn't touch the socket.
+    The status line, headers and any small body get written to `self.wfile`,
+    and a file that still has to be sent is left in `self.body`.
+    """
+    def __init__(
+        self,
+        raw_requestline: bytes,
+        header_data: bytes,
+        client_address: tuple,
+        directory: str,
+    ) -> None:
+        self.raw_requestline = raw_requestline
+        self.rfile = io.BytesIO(header_data)
+        self.wfile = io.BytesIO()
+        self.client_address = client_address
+        self.directory = os.fspath(directory)
+        self.server = None
+        self.body = None
+        self.event_stream = False
+        self.close_connection = True
+    
+    def handle_request(self):
+        """Same as `handle_one_request`, but the request line has already been read."""
+        self.requestline = ''
+        self.request_version = ''
+        self.command = ''
+        
+        if len(self.raw_requestline) > 65536:
+            self.send_error(HTTPStatus.REQUEST_URI_TOO_LONG)
+            return
+        if not self.parse_request():
+            return
+        
+        mname = 'do_' + self.command
+        if not hasattr(self, mname):
+            self.send_error(
+                HTTPStatus.NOT_IMPLEMENTED,
+                "Unsupported method (%r)" % self.command)
+            return
+        getattr(self, mname)()
+    
+    def do_GET(self):
+        self.body = self.send_head()
+        if self.body is None and self.is_live_reload():
+            self.event_stream = True
+    
+    def do_HEAD(self):
+        f = self.send_head()
+        if f:
+            f.close()
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    handler_class: type[AsyncRequestHandler],
+    directory: str,
+    connections: asyncio.Semaphore,
+):
+    loop = asyncio.get_running_loop()
+    client_address = writer.get_extra_info('peername')
+    
+    async with connections:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b'\r\n\r\n'),
+                        handler_class.timeout,
+                    )
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        TimeoutError, ConnectionError):
+                    break
+                
+                requestline, _, header_data = head.partition(b'\r\n')
+                handler = handler_class(
+                    requestline + b'\r\n',
+                    header_data,
+                    client_address,
+                    directory,
+                )
+                # the handler stats, opens and maybe rewrites files, so it
+                # runs in the executor to keep the event loop free
+                await loop.run_in_executor(None, handler.handle_request)
+
+                send_start = time.perf_counter()
+                writer.write(handler.wfile.getvalue())
+                if handler.event_stream:
+                    await send_events(writer, handler.watcher)
+                    break
+                if handler.body is not None:
+                    try:
+                        await send_body(writer, handler)
+                    finally:
+                        handler.body.close()
+                await writer.drain()
+                
+                handler.add_timing('send', time.perf_counter() - send_start)
+                if handler.request_start is not None:
+                    handler.record_metrics()
+
+                if handler.close_connection:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+async def send_body(writer: asyncio.StreamWriter, handler: AsyncRequestHandler):
+    body = handler.body
+    if isinstance(body, io.BytesIO):
+        writer.write(body.getvalue())
+        return
+    
+    offset, count = handler.body_range or (0, None)
+    await writer.drain()
+    # uses os.sendfile when it can, otherwise reads the file in the executor
+    await asyncio.get_running_loop().sendfile(writer.transport, body, offset, count)
+
+
+async def send_events(writer: asyncio.StreamWriter, watcher: FileWatcher):
+    """Send change events to the client until it goes away."""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    unsubscribe = watcher.subscribe(
+        lambda changed: loop.call_soon_threadsafe(events.put_nowait, changed),
+    )
+    try:
+        while True:
+            try:
+                changed = await asyncio.wait_for(events.get(), EVENT_PING_INTERVAL)
+                message = format_event(watcher.version, changed)
+            except TimeoutError:
+                message = b': ping\n\n'
+            writer.write(message)
+            await writer.drain()
+    finally:
+        unsubscribe()
+
+
+async def serve_async(
+    handler_class: type[AsyncRequestHandler],
+    directory: str,
+    port: int,
+    bind: str | None = None,
+    max_connections: int = 256,
+):
+    """Serve `directory` with asyncio instead of a thread per connection.
+
+    At most `max_connections` connections are handled at once. Others wait
+    until a slot frees up.
+    """
+    connections = asyncio.Semaphore(max_connections)
+    
+    server = await asyncio.start_server(
+        functools.partial(
+            handle_connection,
+            handler_class = handler_class,
+            directory = directory,
+            connections = connections,
+        ),
+        host = bind,
+        port = port,
+    )
+
+    host = bind or '0.0.0.0'
+    url_host = f'[{host}]' if ':' in host else host
+    print(
+        f"Serving HTTP on {host} port {port} "
+        f"(http://{url_host}:{port}/) with asyncio ..."
+    )
+    
+    async with server:
+        await server.serve_forever()
 
 
 if __name__ == '__main__':
     import argparse
-    import contextlib
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-b', '--bind', metavar='ADDRESS',
@@ -206,17 +1322,61 @@ if __name__ == '__main__':
                         help='serve this directory '
                              '(default: current directory)')
     parser.add_argument('-p', '--protocol', metavar='VERSION',
-                        default='HTTP/1.0',
+                        default='HTTP/1.1',
                         help='conform to this HTTP version '
                              '(default: %(default)s)')
+    parser.add_argument('--cache-size', default=64, type=int, metavar='MB',
+                        help='maximum size of the in-memory response cache '
+                             '(default: %(default)s MB)')
+    parser.add_argument('-e', '--engine', default='threading',
+                        choices=['threading', 'asyncio'],
+                        help='server to use, a thread per connection or a '
+                             'single asyncio event loop '
+                             '(default: %(default)s)')
+    parser.add_argument('--max-connections', default=256, type=int,
+                        help='connections the asyncio server handles at once '
+                             '(default: %(default)s)')
+    parser.add_argument('--live-reload', default=True,
+                        action=argparse.BooleanOptionalAction,
+                        help='watch the directory and reload pages when '
+                             'something changes (default: on)')
+    parser.add_argument('--watch-interval', default=1, type=float,
+                        metavar='SECONDS',
+                        help='how often to check for changes '
+                             '(default: %(default)s)')
+    parser.add_argument('--slow-request-ms', default=None, type=float,
+                        metavar='MS',
+                        help='log requests that take longer than this '
+                             '(default: off)')
     parser.add_argument('port', default=5500, type=int, nargs='?',
                         help='bind to this port '
                              '(default: %(default)s)')
     args = parser.parse_args()
     handler_class = HTTPServer
+    handler_class.response_cache = ResponseCache(args.cache_size * 1024 * 1024)
+    handler_class.slow_request_threshold = args.slow_request_ms
+
+    if args.live_reload:
+        handler_class.watcher = FileWatcher(args.directory, args.watch_interval)
+        handler_class.watcher.start()
+
+    if args.engine == 'asyncio':
+        AsyncRequestHandler.protocol_version = args.protocol
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(serve_async(
+                AsyncRequestHandler,
+                directory = args.directory,
+                port = args.port,
+                bind = args.bind,
+                max_connections = args.max_connections,
+            ))
+        raise SystemExit
 
     # ensure dual-stack is not disabled; ref #38907
     class DualStackServer(ThreadingHTTPServer):
+        # browsers open a lot of connections at once, and the default
+        # backlog of 5 makes the rest of them wait for a SYN retry
+        request_queue_size = 128
 
         def server_bind(self):
             # suppress exception when protocol is IPv4
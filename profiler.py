@@ -0,0 +1,276 @@
+"""
+Time the stages of a GetGameData run.
+
+Every stage gets its wall time, CPU time (including child processes that
+have finished, like the image pool), the peak memory traced by tracemalloc
+and counts of what it made. Stages can also have steps, like the decode,
+crop and save of every image. Steps can be timed in other processes and
+added afterwards, so their times are summed over all the processes.
+
+tracemalloc only sees memory that Python allocates in this process, so the
+pixel buffers Pillow allocates and the memory of the image pool aren't in
+the peak memory.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Iterator
+
+from rich.console import Console
+from rich.table import Table
+
+def cpu_time():
+    """User and system time of this process and its finished children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def format_size(size: float):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}GB'
+
+def add_step(steps: dict[str, dict[str, float]], name: str, wall: float, cpu: float, items: int = 1):
+    step = steps.setdefault(name, {'wall': 0, 'cpu': 0, 'items': 0})
+    step['wall'] += wall
+    step['cpu'] += cpu
+    step['items'] += items
+
+@contextlib.contextmanager
+def time_step(steps: dict[str, dict[str, float]], name: str, items: int = 1):
+    """Add the time spent in the block to `steps[name]`.
+
+    `steps` is a plain dict, so it can be sent back from a worker process and
+    merged with `Profiler.add_steps`.
+    """
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        add_step(steps, name, time.perf_counter() - start, time.process_time() - start_cpu, items)
+
+
+class Stage:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory = 0
+        self.memory_change = 0
+        self.counts: dict[str, int] = {}
+        self.steps: dict[str, dict[str, float]] = {}
+        self.profile: cProfile.Profile | None = None
+
+    def count(self, name: str, value: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_json(self):
+        return {
+            'name': self.name,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'peak_memory': self.peak_memory,
+            'memory_change': self.memory_change,
+            'counts': self.counts,
+            'steps': self.steps,
+        }
+
+
+class Profiler:
+    """Collect timings for the stages of a run.
+
+    If `enabled` is False, stages still run and can be counted, but nothing
+    is measured, so it can always be used. `trace_memory` turns tracemalloc
+    on, which makes Python code quite a bit slower. If `cprofile` is a file
+    name, every stage is run under cProfile, and the stats of the slowest one
+    are saved there.
+    """
+    def __init__(
+        self,
+        enabled: bool = True,
+        trace_memory: bool = True,
+        cprofile: str | None = None,
+        console: Console | None = None,
+    ) -> None:
+        self.enabled = enabled
+        self.trace_memory = trace_memory and enabled
+        self.cprofile = cprofile if enabled else None
+        self.console = console or Console()
+
+        self.stages: dict[str, Stage] = {}
+        self.current: Stage | None = None
+        self.start = time.perf_counter()
+        self.start_cpu = cpu_time()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory = 0
+
+        # don't stop tracemalloc at the end if something else started it
+        self.started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+
+        parent = self.current
+        self.current = stage
+        if not self.enabled:
+            try:
+                yield stage
+            finally:
+                self.current = parent
+            return
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        if self.cprofile is not None and parent is None:
+            if stage.profile is None:
+                stage.profile = cProfile.Profile()
+            stage.profile.enable()
+
+        start = time.perf_counter()
+        start_cpu = cpu_time()
+        try:
+            yield stage
+        finally:
+            stage.wall += time.perf_counter() - start
+            stage.cpu += cpu_time() - start_cpu
+
+            if stage.profile is not None and parent is None:
+                stage.profile.disable()
+
+            if self.trace_memory:
+                memory, peak = tracemalloc.get_traced_memory()
+                stage.peak_memory = max(stage.peak_memory, peak)
+                stage.memory_change += memory - start_memory
+                self.peak_memory = max(self.peak_memory, peak)
+
+            self.current = parent
+
+    @contextlib.contextmanager
+    def step(self, name: str, items: int = 1):
+        """Time part of the current stage."""
+        if not self.enabled or self.current is None:
+            yield
+            return
+
+        with time_step(self.current.steps, name, items):
+            yield
+
+    def add_steps(self, steps: dict[str, dict[str, float]]):
+        """Add steps that were timed somewhere else (like in a worker process) to the current stage."""
+        if not self.enabled or self.current is None:
+            return
+
+        for name, step in steps.items():
+            add_step(self.current.steps, name, step['wall'], step['cpu'], step['items'])
+
+    def count(self, name: str, value: int = 1):
+        if self.current is not None:
+            self.current.count(name, value)
+
+    def slowest(self):
+        if not self.stages:
+            return None
+        return max(self.stages.values(), key = lambda stage: stage.wall)
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = cpu_time() - self.start_cpu
+
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def to_json(self):
+        slowest = self.slowest()
+        return {
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'peak_memory': self.peak_memory if self.trace_memory else None,
+            'slowest': slowest.name if slowest else None,
+            'cprofile': self.cprofile,
+            'stages': [stage.to_json() for stage in self.stages.values()],
+        }
+
+    def save(self, path: str):
+        with open(path, 'w', encoding = 'utf-8') as file:
+            json.dump(self.to_json(), file, indent = 2)
+
+    def save_cprofile(self):
+        """Save the cProfile stats of the slowest stage, and print its top functions."""
+        slowest = self.slowest()
+        if self.cprofile is None or slowest is None or slowest.profile is None:
+            return
+
+        slowest.profile.dump_stats(self.cprofile)
+        self.console.print(f'cProfile stats for {slowest.name} saved to {self.cprofile}')
+
+        output = io.StringIO()
+        stats = pstats.Stats(slowest.profile, stream = output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(15)
+        self.console.print(output.getvalue(), markup = False, highlight = False)
+
+    def print_summary(self):
+        table = Table(title = f'{self.wall:.2f}s total, {self.cpu:.2f}s cpu')
+        table.add_column('stage')
+        table.add_column('wall', justify = 'right')
+        table.add_column('cpu', justify = 'right')
+        table.add_column('%', justify = 'right')
+        if self.trace_memory:
+            table.add_column('peak memory', justify = 'right')
+            table.add_column('change', justify = 'right')
+        table.add_column('made')
+
+        slowest = self.slowest()
+        total = self.wall or 1
+        for stage in self.stages.values():
+            style = 'bold' if stage is slowest else None
+            row = [
+                stage.name,
+                f'{stage.wall:.2f}s',
+                f'{stage.cpu:.2f}s',
+                f'{stage.wall / total:.0%}',
+            ]
+            if self.trace_memory:
+                row.extend((format_size(stage.peak_memory), format_size(stage.memory_change)))
+            row.append(', '.join(f'{value} {name}' for name, value in stage.counts.items()))
+            table.add_row(*row, style = style)
+
+            for name, step in stage.steps.items():
+                row = [
+                    f'  {name}',
+                    f'{step["wall"]:.2f}s',
+                    f'{step["cpu"]:.2f}s',
+                    '',
+                ]
+                if self.trace_memory:
+                    row.extend(('', ''))
+                row.append(f'{step["items"]:.0f}')
+                table.add_row(*row, style = 'dim')
+
+        self.console.print(table)
+
+    def report(self, path: str | None = None):
+        """Print the summary, and save the JSON report and cProfile stats."""
+        if not self.enabled:
+            return
+
+        self.print_summary()
+        self.save_cprofile()
+        if path:
+            self.save(path)
+            self.console.print(f'profile saved to {path}')
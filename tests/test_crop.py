@@ -0,0 +1,57 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from PIL import Image
+
+from crop import crop_file
+
+
+class CropFileTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def make_image(self, name: str, size: tuple[int, int], *boxes: tuple[int, int, int, int]):
+        path = os.path.join(self.folder.name, name)
+        image = Image.new('RGBA', size, (0, 0, 0, 0))
+        for box in boxes:
+            image.paste((255, 0, 0, 255), box)
+        image.save(path)
+        return path
+
+    def test_skip_tight_crops_top_left_sprite(self):
+        # the sprite touches the top and left edges, but the top left pixel is
+        # still transparent, so the box starts at (0, 0)
+        path = self.make_image('top-left.png', (200, 200), (1, 0, 100, 100), (0, 1, 100, 100))
+
+        self.assertEqual(crop_file(path, skip_tight = True), ('processed', None))
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (100, 100))
+
+    def test_skip_tight_skips_cropped_image(self):
+        path = self.make_image('tight.png', (100, 100), (0, 0, 100, 100))
+
+        self.assertEqual(crop_file(path, skip_tight = True), ('skipped', None))
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (100, 100))
+
+    @unittest.skipIf(os.name == 'nt', 'file modes are not supported on Windows')
+    def test_keeps_file_mode(self):
+        path = self.make_image('mode.png', (200, 200), (50, 50, 150, 150))
+        os.chmod(path, 0o644)
+
+        self.assertEqual(crop_file(path), ('processed', None))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+    def test_crops_centered_sprite(self):
+        path = self.make_image('centered.png', (200, 200), (50, 60, 150, 170))
+
+        self.assertEqual(crop_file(path), ('processed', None))
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (100, 110))
+
+
+if __name__ == '__main__':
+    unittest.main()
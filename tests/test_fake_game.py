@@ -0,0 +1,57 @@
+import glob
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from fake_game import LANGUAGES, FakeGame, write_loc
+
+try:
+    from luna_kit.loc import LOC
+    from luna_kit.pvr import PVR
+except ImportError:
+    LOC = PVR = None
+
+
+@unittest.skipIf(LOC is None, 'luna_kit is not installed')
+class FakeGameTest(unittest.TestCase):
+    def setUp(self) -> None:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def test_luna_kit_reads_the_generated_files(self):
+        game = FakeGame(self.folder, ponies = 20, image_scale = 0.25, pvr_ratio = 0.5)
+        counts = game.generate()
+
+        loc_files = glob.glob(os.path.join(self.folder, '*.loc'))
+        self.assertEqual(len(loc_files), len(LANGUAGES))
+        for filename in loc_files:
+            loc = LOC(filename)
+            for key in game.strings:
+                self.assertIn(key, loc)
+                self.assertNotEqual(loc.translate(key), '')
+
+        pvr_files = glob.glob(os.path.join(self.folder, '**', '*.pvr'), recursive = True)
+        self.assertTrue(pvr_files)
+        self.assertEqual(sorted(pvr_files), sorted(game.pvr_files))
+        for filename in pvr_files:
+            self.assertEqual(PVR(filename, external_alpha = True).image.size, game.pvr_files[filename][0])
+
+        self.assertGreater(counts['images'], len(pvr_files))
+
+    def test_verify_fails_when_strings_read_back_wrong(self):
+        game = FakeGame(self.folder, ponies = 5, images = False)
+        game.generate()
+
+        filename, strings = next(iter(game.loc_files.items()))
+        write_loc(filename, {key: 'wrong' for key in strings})
+
+        with self.assertRaises(ValueError):
+            game.verify()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from local_server import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+
+        self.path = os.path.join(folder.name, 'file.txt')
+        with open(self.path, 'w') as file:
+            file.write('hello')
+
+        self.loads = 0
+        self.loads_lock = threading.Lock()
+
+    def load(self, path: str, delay: float = 0):
+        with self.loads_lock:
+            self.loads += 1
+        time.sleep(delay)
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_loads_once_for_concurrent_requests(self):
+        cache = ResponseCache()
+        start = threading.Barrier(16)
+        results = []
+
+        def get():
+            start.wait()
+            results.append(cache.get(self.path, lambda path: self.load(path, 0.1)))
+
+        threads = [threading.Thread(target = get) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.loads, 1)
+        self.assertEqual([body for body, hit in results], [b'hello'] * 16)
+        self.assertEqual(sorted(hit for body, hit in results), [False] + [True] * 15)
+        self.assertEqual((cache.misses, cache.hits), (1, 15))
+
+    def test_no_reload_while_storing_the_result(self):
+        results = []
+        others = []
+
+        class SlowAddCache(ResponseCache):
+            def add(self, path, version, body):
+                # another request comes in right when the loaded body is being stored
+                other = threading.Thread(target = lambda: results.append(self.get(path, test.load)))
+                other.start()
+                others.append(other)
+                time.sleep(0.2)
+                super().add(path, version, body)
+
+        test = self
+        cache = SlowAddCache()
+        body, hit = cache.get(self.path, self.load)
+        for other in others:
+            other.join(5)
+
+        self.assertEqual((body, hit), (b'hello', False))
+        self.assertEqual(results, [(b'hello', True)])
+        self.assertEqual(self.loads, 1)
+
+    def test_reloads_when_the_file_changes(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.get(self.path, self.load), (b'hello', False))
+        self.assertEqual(cache.get(self.path, self.load), (b'hello', True))
+
+        with open(self.path, 'w') as file:
+            file.write('changed')
+        os.utime(self.path, ns = (0, time.time_ns() + 1_000_000_000))
+
+        self.assertEqual(cache.get(self.path, self.load), (b'changed', False))
+        self.assertEqual(self.loads, 2)
+
+    def test_failed_load_is_not_cached(self):
+        cache = ResponseCache()
+
+        def fail(path: str):
+            raise OSError('nope')
+
+        with self.assertRaises(OSError):
+            cache.get(self.path, fail)
+        self.assertEqual(cache.get(self.path, self.load), (b'hello', False))
+        self.assertEqual(cache.loading, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
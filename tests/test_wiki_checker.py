@@ -0,0 +1,356 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import threading
+import time
+import unittest
+from urllib.parse import parse_qs, urlsplit
+
+from rich.console import Console
+
+from wiki_checker import API_BATCH_SIZE, RateLimiter, WikiChecker, apply_status, resolve_titles
+
+
+class FakeWiki:
+    """A wiki on loopback.
+
+    `pages` maps a path to the statuses it answers with, one per request (the
+    last one repeats), or `{method: statuses}` to answer differently to HEAD
+    and GET. Every request is logged as `(method, path)`.
+
+    `/api.php` answers `action=query` like MediaWiki, from `titles`, which
+    maps a title to `'exists'`, `'missing'` or `'redirect'`. Titles are
+    normalised by capitalising the first letter, and titles in `omitted` are
+    left out of the response. `/broken/api.php` always answers with an error.
+    The titles of every api query are kept in `api_calls`.
+    """
+    def __init__(self) -> None:
+        self.pages: dict[str, list[int] | dict[str, list[int]]] = {}
+        self.log: list[tuple[str, str]] = []
+        self.titles: dict[str, str] = {}
+        self.omitted: set[str] = set()
+        self.api_calls: list[list[str]] = []
+        self.lock = threading.Lock()
+
+        wiki = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                wiki.respond(self)
+
+            def do_GET(self):
+                wiki.respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requests(self, path: str, method: str | None = None):
+        return [
+            logged for logged in self.log
+            if logged[1] == path and (method is None or logged[0] == method)
+        ]
+
+    def next_status(self, method: str, path: str):
+        with self.lock:
+            self.log.append((method, path))
+            statuses = self.pages.get(path, [404])
+            if isinstance(statuses, dict):
+                statuses = statuses.get(method, [404])
+
+            if len(statuses) > 1:
+                return statuses.pop(0)
+            return statuses[0]
+
+    def query(self, titles: list[str]):
+        normalized = []
+        redirects = []
+        pages = []
+        for title in titles:
+            name = title[:1].upper() + title[1:]
+            if name != title:
+                normalized.append({'from': title, 'to': name})
+            if name in self.omitted:
+                continue
+
+            status = self.titles.get(name, 'missing')
+            if status == 'redirect':
+                target = name + ' (target)'
+                redirects.append({'from': name, 'to': target})
+                pages.append({'title': target, 'pageid': len(pages) + 1})
+            elif status == 'exists':
+                pages.append({'title': name, 'pageid': len(pages) + 1})
+            else:
+                pages.append({'title': name, 'missing': True})
+
+        return {
+            'batchcomplete': True,
+            'query': {
+                'normalized': normalized,
+                'redirects': redirects,
+                'pages': pages,
+            },
+        }
+
+    def respond_api(self, handler: BaseHTTPRequestHandler, path: str, query: dict[str, list[str]]):
+        with self.lock:
+            self.log.append((handler.command, path))
+            titles = query.get('titles', [''])[0].split('|')
+            self.api_calls.append(titles)
+
+        if path.startswith('/broken/'):
+            data = {'error': {'code': 'readapidenied', 'info': 'You need read permission'}}
+        else:
+            data = self.query(titles)
+
+        body = json.dumps(data).encode()
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def respond(self, handler: BaseHTTPRequestHandler):
+        url = urlsplit(handler.path)
+        path = url.path
+        if path.endswith('/api.php'):
+            self.respond_api(handler, path, parse_qs(url.query))
+            return
+        
+        status = self.next_status(handler.command, path)
+        body = b'page'
+
+        handler.send_response(status)
+        if status == 301:
+            handler.send_header('Location', self.url + path + '_redirect')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+
+class WikiCheckerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.wiki = FakeWiki()
+        self.addCleanup(self.wiki.close)
+
+    def make_checker(self, **kwargs):
+        options = {
+            'rate': None,
+            'backoff': 0,
+            'console': Console(file = io.StringIO()),
+            'use_api': False,
+        }
+        options.update(kwargs)
+        return WikiChecker(**options)
+
+    def check(self, path: str, **kwargs):
+        checker = self.make_checker(**kwargs)
+        page_result = {'exists': False, 'redirect': False, 'path': path}
+        checker.add(self.wiki.url + path, page_result)
+        summary = checker.run()
+        return page_result, summary
+
+    def test_status_mapping(self):
+        self.wiki.pages = {
+            '/wiki/Exists': [200],
+            '/wiki/Redirect': [301],
+            '/wiki/Missing': [404],
+        }
+
+        page_result, summary = self.check('/wiki/Exists')
+        self.assertEqual((page_result['exists'], page_result['redirect']), (True, False))
+        self.assertEqual(summary['exists'], 1)
+
+        page_result, summary = self.check('/wiki/Redirect')
+        self.assertEqual((page_result['exists'], page_result['redirect']), (True, True))
+        self.assertEqual(summary['redirect'], 1)
+
+        page_result, summary = self.check('/wiki/Missing')
+        self.assertEqual((page_result['exists'], page_result['redirect']), (False, False))
+        self.assertIn('timestamp', page_result)
+        self.assertEqual(summary['missing'], 1)
+
+    def test_retries_429_and_503(self):
+        self.wiki.pages = {'/wiki/Busy': [429, 503, 200]}
+
+        page_result, summary = self.check('/wiki/Busy', retries = 3)
+
+        self.assertEqual(len(self.wiki.requests('/wiki/Busy')), 3)
+        self.assertTrue(page_result['exists'])
+        self.assertEqual(summary['exists'], 1)
+
+    def test_gives_up_after_retries(self):
+        self.wiki.pages = {'/wiki/Down': [503]}
+
+        page_result, summary = self.check('/wiki/Down', retries = 2)
+
+        self.assertEqual(len(self.wiki.requests('/wiki/Down')), 3)
+        self.assertEqual(summary['error'], 1)
+        self.assertFalse(page_result['exists'])
+        self.assertNotIn('timestamp', page_result)
+
+    def test_head_not_allowed_falls_back_to_get(self):
+        self.wiki.pages = {'/wiki/No_Head': {'HEAD': [405], 'GET': [200]}}
+
+        page_result, summary = self.check('/wiki/No_Head')
+
+        self.assertEqual(
+            self.wiki.requests('/wiki/No_Head'),
+            [('HEAD', '/wiki/No_Head'), ('GET', '/wiki/No_Head')],
+        )
+        self.assertTrue(page_result['exists'])
+        self.assertEqual(summary['exists'], 1)
+
+    def test_apply_status(self):
+        page_result = {'exists': True, 'redirect': True}
+        apply_status(page_result, 200)
+        self.assertEqual((page_result['exists'], page_result['redirect']), (True, False))
+
+        apply_status(page_result, 410)
+        self.assertEqual((page_result['exists'], page_result['redirect']), (False, False))
+        self.assertIn('timestamp', page_result)
+
+
+class WikiApiTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.wiki = FakeWiki()
+        self.addCleanup(self.wiki.close)
+
+    def make_checker(self, **kwargs):
+        options = {
+            'rate': None,
+            'backoff': 0,
+            'concurrency': 1,
+            'console': Console(file = io.StringIO()),
+        }
+        options.update(kwargs)
+        return WikiChecker(**options)
+
+    def add_pages(self, checker: WikiChecker, titles: list[str], api_path: str = '/api.php'):
+        results = {}
+        for title in titles:
+            path = '/wiki/' + title.replace(' ', '_')
+            results[title] = {'exists': False, 'redirect': False, 'path': path}
+            checker.add(self.wiki.url + path, results[title], api_url = self.wiki.url + api_path, title = title)
+        return results
+
+    def statuses(self, results: dict[str, dict]):
+        return {
+            title: 'redirect' if result['redirect'] else 'exists' if result['exists'] else 'missing'
+            for title, result in results.items()
+        }
+
+    def test_resolve_titles(self):
+        data = {
+            'query': {
+                'normalized': [{'from': 'lower', 'to': 'Lower'}],
+                'redirects': [{'from': 'Old', 'to': 'New'}],
+                'pages': [
+                    {'title': 'Lower', 'pageid': 1},
+                    {'title': 'New', 'pageid': 2},
+                    {'title': 'Gone', 'missing': True},
+                    {'title': 'Special', 'missing': True, 'known': True},
+                    {'title': 'Bad|title', 'invalid': True},
+                ],
+            },
+        }
+
+        self.assertEqual(
+            resolve_titles(['lower', 'Old', 'Gone', 'Special', 'Bad|title', 'Unknown'], data),
+            {
+                'lower': 'exists',
+                'Old': 'redirect',
+                'Gone': 'missing',
+                'Special': 'exists',
+                'Bad|title': 'missing',
+            },
+        )
+
+    def test_batches(self):
+        expected = {}
+        for index in range(API_BATCH_SIZE * 2 + 20):
+            kind = ('exists', 'missing', 'redirect')[index % 3]
+            title = f'Page {index}'
+            self.wiki.titles[title] = kind
+            # some titles need normalising
+            if index % 4 == 0:
+                title = title[0].lower() + title[1:]
+            expected[title] = kind
+        
+        checker = self.make_checker()
+        results = self.add_pages(checker, list(expected))
+        summary = checker.run()
+
+        self.assertEqual([len(titles) for titles in self.wiki.api_calls], [API_BATCH_SIZE, API_BATCH_SIZE, 20])
+        self.assertEqual(self.statuses(results), expected)
+        self.assertEqual(summary['exists'] + summary['missing'] + summary['redirect'], len(expected))
+        # nothing was checked page by page
+        self.assertEqual([method for method, path in self.wiki.log if method == 'HEAD'], [])
+
+    def test_titles_left_out_are_checked_by_page(self):
+        self.wiki.titles = {'Listed': 'exists', 'Left out': 'exists'}
+        self.wiki.omitted = {'Left out'}
+        self.wiki.pages = {'/wiki/Left_out': [301]}
+
+        checker = self.make_checker()
+        results = self.add_pages(checker, ['Listed', 'Left out'])
+        checker.run()
+
+        self.assertEqual(self.statuses(results), {'Listed': 'exists', 'Left out': 'redirect'})
+        self.assertEqual(self.wiki.requests('/wiki/Left_out', 'HEAD'), [('HEAD', '/wiki/Left_out')])
+
+    def test_broken_api_falls_back_to_head(self):
+        titles = [f'Page {index}' for index in range(API_BATCH_SIZE + 10)]
+        expected = {}
+        for index, title in enumerate(titles):
+            expected[title] = ('exists', 'missing', 'redirect')[index % 3]
+            self.wiki.pages['/wiki/' + title.replace(' ', '_')] = [{'exists': 200, 'missing': 404, 'redirect': 301}[expected[title]]]
+        
+        checker = self.make_checker()
+        results = self.add_pages(checker, titles, '/broken/api.php')
+        summary = checker.run()
+
+        # the api is only tried once, then every page is checked with HEAD
+        self.assertEqual(len(self.wiki.api_calls), 1)
+        self.assertIn(self.wiki.url + '/broken/api.php', checker.broken_apis)
+        self.assertEqual(len([method for method, path in self.wiki.log if method == 'HEAD']), len(titles))
+        self.assertEqual(self.statuses(results), expected)
+        self.assertEqual(summary['error'], 0)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_spaces_out_calls(self):
+        limiter = RateLimiter(20)
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        elapsed = time.monotonic() - start
+
+        # the first call goes right away, then one every 50ms
+        self.assertGreaterEqual(elapsed, 0.19)
+
+    def test_no_limit(self):
+        limiter = RateLimiter(None)
+
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.wait()
+
+        self.assertLess(time.monotonic() - start, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
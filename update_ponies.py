@@ -1,19 +1,27 @@
 import argparse
+import codecs
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import functools
 from glob import glob
 import io
 import json
 import os
 import pathlib
 import shutil
+import struct
 from types import EllipsisType
 from typing import Any
 from typing import Iterable, Optional, Sequence, Union
 import urllib.parse
 from datetime import datetime, timedelta
 import re
+import traceback
+import tracemalloc
+import unicodedata
 
 import charset_normalizer
-import requests
 from rich.progress import (
     BarColumn,
     MofNCompleteColumn,
@@ -27,6 +35,8 @@ console = Console()
 
 from PIL import Image
 from crop import crop_image
+from profiler import Profiler, time_step
+from wiki_checker import WikiChecker, WikiStatusCache
 
 from luna_kit.gameobjectdata import GameObject, GameObjectData
 from luna_kit.loc import LOC
@@ -71,6 +81,12 @@ WIKI_URLS = {
     'fandom': 'https://mlp-gameloft.fandom.com/wiki/',
 }
 
+# MediaWiki api.php for each wiki, so pages can be checked in batches
+WIKI_API_URLS = {
+    'indie': 'https://mlp-game-wiki.no/api.php',
+    'fandom': 'https://mlp-gameloft.fandom.com/api.php',
+}
+
 WIKI_PAGES = {
     'indie': {
         'page': '{name}',
@@ -124,6 +140,13 @@ def strToInt(value: str):
     except ValueError:
         return -1
 
+def positive_int(value: str):
+    """argparse type for counts that have to be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {number}')
+    return number
+
 def normalize_path(path: str):
     return pathlib.Path(path).as_posix()
 
@@ -149,10 +172,23 @@ def track(
             total = total,
         )
 
-def check_wiki(name: str, result: Optional[dict] = None, check: bool = False):
+def check_wiki(
+    name: str,
+    result: Optional[dict] = None,
+    check: bool = False,
+    checker: WikiChecker | None = None,
+):
+    """
+    Fill in the wiki status of a page. If `check` is True, the pages that
+    need checking are queued on `checker`, and get updated when it runs. If
+    there's no checker, they're checked right away.
+    """
     if not isinstance(result, dict):
         result = {}
     
+    run_now = check and checker is None
+    if run_now:
+        checker = WikiChecker(console = console)
     
     for wiki, wiki_url in WIKI_URLS.items():
         if not wiki_url.endswith('/') and not wiki_url.endswith('\\'):
@@ -165,38 +201,122 @@ def check_wiki(name: str, result: Optional[dict] = None, check: bool = False):
                 'redirect': False,
                 'path': url_template.format(name = name),
             })
-            if check and (not page_result.get('exists', False) or page_result.get('redirect', False)):
+            if not check:
+                continue
+            
+            if checker.cache is not None:
+                # the cache decides what's stale
+                page_result['path'] = url_template.format(name = name)
+                checker.add(
+                    wiki_url + page_result['path'],
+                    page_result,
+                    f'{wiki}:{page_result["path"]}',
+                    WIKI_API_URLS.get(wiki) if checker.use_api else None,
+                    urllib.parse.unquote(page_result['path']).replace('_', ' '),
+                )
+            elif not page_result.get('exists', False) or page_result.get('redirect', False):
                 page_result['path'] = url_template.format(name = name)
                 url = wiki_url + page_result.get('path', url_template.format(name = name))
 
                 if (datetime.now() - datetime.fromtimestamp(page_result.get('timestamp', 0))) < timedelta(days = 1):
                     console.print(f'skipping {url}')
                     continue
-                    
-                response = requests.head(url)
-                if response.status_code == 301:
-                    page_result['exists'] = True
-                    page_result['redirect'] = True
-                elif response.status_code == 200:
-                    page_result['exists'] = True
-                    page_result['redirect'] = False
-                else:
-                    page_result['exists'] = False
-                    page_result['redirect'] = False
-                    page_result['timestamp'] = datetime.now().timestamp()
-                    console.print(f'[red]no page for [blue]{url}[/]')
+                
+                checker.add(
+                    url,
+                    page_result,
+                    api_url = WIKI_API_URLS.get(wiki) if checker.use_api else None,
+                    title = urllib.parse.unquote(page_result['path']).replace('_', ' '),
+                )
+    
+    if run_now:
+        checker.run()
         
     return result
 
-def add_translation(key: str, pony_info: dict, loc_files: list[LOC], type: str = 'name', locked: bool = False):
-    unknown_name = False
-    for loc in loc_files:
-        lang = loc['DEV_ID'].lower()
-        if key not in loc and not unknown_name:
-            print(f"No {type} for {key}")
-            unknown_name = True
+def normalize_string(string: str):
+    return string.strip().replace('|', '')
+
+class TranslationTable:
+    """Translations for every language, looked up once per key.
+
+    Each key is translated in every loc file the first time it's used, and
+    the normalised strings are kept as `{language: string}`. Keys that aren't
+    in some of the loc files are tracked in `missing`.
+    """
+    def __init__(self, loc_files: list[LOC]) -> None:
+        self.languages: list[tuple[str, LOC]] = [
+            (loc['DEV_ID'].lower(), loc) for loc in loc_files
+        ]
+        self.strings: dict[str, dict[str, str]] = {}
+        self.missing: dict[str, list[str]] = {}
+    
+    def __getitem__(self, key: str) -> dict[str, str]:
+        strings = self.strings.get(key)
+        if strings is not None:
+            return strings
+        
+        strings = {}
+        missing = []
+        for lang, loc in self.languages:
+            if key not in loc:
+                missing.append(lang)
+            strings[lang] = normalize_string(loc.translate(key))
+        
+        if missing and key:
+            self.missing[key] = missing
+        
+        self.strings[key] = strings
+        return strings
+    
+    def missing_by_language(self) -> dict[str, list[str]]:
+        """Get the keys that are missing in each language."""
+        languages: dict[str, list[str]] = {}
+        for key, missing in self.missing.items():
+            for lang in missing:
+                languages.setdefault(lang, []).append(key)
+        
+        return {lang: sorted(keys) for lang, keys in sorted(languages.items())}
+
+    def report_missing(self, path: str | None = None, shown: int = 10):
+        """
+        Print the keys that are missing in each language (only the first
+        `shown` of them, unless it's None), and write all of them to `path`
+        as `{language: [key, ...]}`.
+        """
+        languages = self.missing_by_language()
+
+        if path is not None:
+            write_json(path, languages)
+        
+        if not self.missing:
+            return
+        
+        console.print(f'{len(self.missing)} of {len(self.strings)} keys are missing translations')
+        for lang, keys in languages.items():
+            console.print(f'  {lang}: {len(keys)}')
+            for key in keys[:shown]:
+                console.print(f'    {key}', markup = False, highlight = False)
+            if shown is not None and len(keys) > shown:
+                console.print(f'    ... and {len(keys) - shown} more')
+        
+        if path is not None:
+            console.print(f'missing translations saved to {path}')
+
+def get_translation_table(loc_files: list[LOC] | TranslationTable):
+    if isinstance(loc_files, TranslationTable):
+        return loc_files
+    return TranslationTable(loc_files)
+
+def add_translation(key: str, pony_info: dict, loc_files: list[LOC] | TranslationTable, type: str = 'name', locked: bool = False):
+    table = get_translation_table(loc_files)
+    strings = table[key]
+
+    if key in table.missing:
+        print(f"No {type} for {key}")
+    
+    for lang, name in strings.items():
         if not locked or (locked and lang not in pony_info[type]):
-            name = loc.translate(key).strip().replace('|', '')
             if lang in pony_info[type] and pony_info[type][lang].replace('|', '') != name:
                 print(f'new: {name}')
                 print(f"old: {pony_info[type][lang].replace('|', '')}")
@@ -205,69 +325,563 @@ def add_translation(key: str, pony_info: dict, loc_files: list[LOC], type: str =
 
 def translate(
     key: str,
-    loc_files: list[LOC],
+    loc_files: list[LOC] | TranslationTable,
     translation: dict[str, str] = ...,
     locked: bool = False,
 ) -> dict[str, str]:
     if translation is Ellipsis or translation is None:
         translation = {}
-    for loc in loc_files:
-        lang = loc['DEV_ID'].lower()
-
-        string = loc.translate(key)
-
-        if locked:
-            string = translation.setdefault(lang, string)
+    
+    for lang, string in get_translation_table(loc_files)[key].items():
+        if locked and lang in translation:
+            string = normalize_string(translation[lang])
         
-        string = string.strip().replace('|', '')
         translation[lang] = string
     
     return translation
 
 
-def get_encoding(file_path: str):
-    return charset_normalizer.from_path(file_path).best().encoding
+# utf-32 has to come before utf-16, since BOM_UTF32_LE starts with BOM_UTF16_LE
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
 
+def detect_encoding(data: bytes) -> str:
+    """
+    Check for a BOM, then check if it's valid utf-8, and only use
+    charset_normalizer if it's neither, since that's really slow on big files.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    
+    try:
+        data.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    result = charset_normalizer.from_bytes(data).best()
+    if result is None:
+        raise ValueError('could not detect encoding')
+    
+    return result.encoding
 
-def find_in_sprite(sprite: str, key: str):
-    with open(sprite, 'r', encoding = 'utf-8') as file:
-        sprite_content = file.read()
+encoding_cache: dict[tuple[str, int, int], str] = {}
+
+def get_encoding(file_path: str, data: bytes | None = None, encoding: str | None = None):
+    """Get the encoding of a file, cached by path and mtime.
+
+    `data` can be passed if the file has already been read. If `encoding` is
+    passed, detection is skipped and it's returned as is.
+    """
+    if encoding is not None:
+        return encoding
     
-    console.print('pattern', fr'FRAME\s+"{re.escape(key)}"(\s*\/\/.*)?\s*{'{'}[\S\s]*FM\s+(0x\d+)')
-    match = re.search(
-        fr'FRAME\s+"{re.escape(key)}"(\s*\/\/.*)?\s*{'{'}[\S\s]*FM\s+(0x\d+)',
-        sprite_content,
-        re.MULTILINE,
-    )
+    stat = os.stat(file_path)
+    key = (os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size)
+
+    encoding = encoding_cache.get(key)
+    if encoding is None:
+        if data is None:
+            with open(file_path, 'rb') as file:
+                data = file.read()
+        
+        encoding = encoding_cache[key] = detect_encoding(data)
+    
+    return encoding
 
-    if match is None:
-        console.print('could not find frame')
+
+# These match GameData.transformName in scripts/gameData.js
+SEARCH_OPTIONS = {
+    'ignoreSpaces': True,
+    'caseSensitive': False,
+    'ignoreAccents': True,
+    'ignorePunctuation': True,
+}
+SEARCH_PUNCTUATION = re.compile(r'[,.()"\']')
+COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+def search_name(name: str):
+    """Normalise a name the same way the site does for searching."""
+    name = name.replace('|', '').lower()
+    name = SEARCH_PUNCTUATION.sub('', name.replace('-', ' '))
+    name = COMBINING_MARKS.sub('', unicodedata.normalize('NFD', name))
+    return name.replace(' ', '')
+
+
+def iterencode_json(value: Any, compact: bool = False, depth: int = 4, level: int = 0):
+    """Encode json in chunks.
+
+    Dicts are streamed key by key for `depth` levels, and anything deeper is
+    encoded in one go with json.dumps. The pretty output is exactly the same
+    as `json.dump(value, indent = 2, ensure_ascii = False)`.
+    """
+    if depth <= 0 or not isinstance(value, dict) or not value:
+        if compact:
+            yield json.dumps(value, ensure_ascii = False, separators = (',', ':'))
+        else:
+            yield json.dumps(value, ensure_ascii = False, indent = 2).replace('\n', '\n' + '  ' * level)
         return
     
-    module_id = match.group(2)
+    indent = '\n' + '  ' * (level + 1)
+    for index, (key, item) in enumerate(value.items()):
+        if not isinstance(key, str):
+            key = json.dumps(key)
+        key = json.dumps(key, ensure_ascii = False)
+
+        if compact:
+            yield ('{' if index == 0 else ',') + key + ':'
+        else:
+            yield ('{' if index == 0 else ',') + indent + key + ': '
+        
+        yield from iterencode_json(item, compact, depth - 1, level + 1)
+    
+    yield '}' if compact else '\n' + '  ' * level + '}'
+
+def write_json(path: str, value: Any, compact: bool = False):
+    """
+    Stream json to a temporary file next to `path`, then replace `path` with
+    it, so the old file is still there if something goes wrong.
+
+    Returns the `size` and sha256 `hash` of what was written.
+    """
+    temp_path = path + '.tmp'
+    size = 0
+    hash = hashlib.sha256()
+    try:
+        with open(temp_path, 'wb', buffering = 1024 * 1024) as file:
+            for chunk in iterencode_json(value, compact):
+                chunk = chunk.encode('utf-8')
+                size += len(chunk)
+                hash.update(chunk)
+                file.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+    return {
+        'size': size,
+        'hash': 'sha256-' + hash.hexdigest(),
+    }
 
-    match = re.search(
-        fr'MD\s+{re.escape(module_id)}\s+MD_IMAGE\s+(?P<image>\d+)\s+(?P<x>\d+)\s+(?P<y>\d+)\s+(?P<w>\d+)\s+(?P<h>\d+)',
-        sprite_content,
-    )
+def read_json(path: str, default: Any = ..., encoding: str | None = None):
+    if default is not Ellipsis and not os.path.exists(path):
+        return default
+    
+    with open(path, 'rb') as file:
+        data = file.read()
+    
+    return json.loads(data.decode(get_encoding(path, data, encoding)))
 
-    if match is None:
-        console.print('could not find module')
-        return
+
+SPRITE_IMAGE = re.compile(r'^\s*IMAGE\s+(0x[0-9a-fA-F]+)\s+"([^"]*)"')
+SPRITE_MODULE = re.compile(r'^\s*MD\s+(0x[0-9a-fA-F]+)\s+MD_IMAGE\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)')
+SPRITE_FRAME = re.compile(r'^\s*FRAME\s+"([^"]*)"')
+SPRITE_FRAME_MODULE = re.compile(r'^\s*FM\s+(0x[0-9a-fA-F]+)')
+
+@functools.cache
+def parse_sprite(sprite: str):
+    """Parse a .sprite file into lookup tables.
+
+    Returns a dict with `frames` (frame name -> first module id), `modules`
+    (module id -> image, x, y, w, h) and `images` (image id -> filename).
+    This is cached by path, so atlases shared by a lot of objects are only
+    read once per run.
+    """
+    frames: dict[str, int] = {}
+    modules: dict[int, dict[str, int]] = {}
+    images: dict[int, str] = {}
+
+    frame = None
+
+    with open(sprite, 'r', encoding = 'utf-8') as file:
+        for line in file:
+            if match := SPRITE_FRAME.match(line):
+                frame = match.group(1)
+            elif frame is not None and (match := SPRITE_FRAME_MODULE.match(line)):
+                frames.setdefault(frame, int(match.group(1), 16))
+                frame = None
+            elif match := SPRITE_MODULE.match(line):
+                modules[int(match.group(1), 16)] = {
+                    'image': int(match.group(2)),
+                    'x': int(match.group(3)),
+                    'y': int(match.group(4)),
+                    'w': int(match.group(5)),
+                    'h': int(match.group(6)),
+                }
+            elif match := SPRITE_IMAGE.match(line):
+                images[int(match.group(1), 16)] = match.group(2)
     
-    image_id = int(match.groupdict()['image'])
+    return {
+        'frames': frames,
+        'modules': modules,
+        'images': images,
+    }
 
-    match = re.search(
-        rf'(?<=IMAGE 0x{image_id:04x} ").*(?=")',
-        sprite_content,
-    )
+def find_in_sprite(sprite: str, key: str):
+    sprite_data = parse_sprite(sprite)
 
-    if match is None:
+    module_id = sprite_data['frames'].get(key)
+    if module_id is None:
+        console.print('could not find frame')
+        return
+    
+    module = sprite_data['modules'].get(module_id)
+    if module is None:
+        console.print('could not find module')
+        return
+    
+    image = sprite_data['images'].get(module['image'])
+    if image is None:
         console.print('could not find image')
         return
     
-    return match.group()
+    return image
+
+
+# Anything that changes how an image comes out of extract_image should change
+# this, so the manifest knows to redo every image.
+IMAGE_SETTINGS = {
+    'version': 1,
+    'crop': True,
+    'format': 'png',
+}
+
+def file_info(path: str, hash: bool = True):
+    stat = os.stat(path)
+    info = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+    }
+
+    if hash:
+        with open(path, 'rb') as file:
+            info['hash'] = hashlib.file_digest(file, 'sha1').hexdigest()
+    
+    return info
+
+def resolve_image(input_path: str, sprite: bool = True):
+    """Find the file an image gets loaded from.
+
+    Returns `(image_path, sources)`, where `sources` are all the files that
+    were used to find the image. `image_path` is None if there's no image.
+    """
+    sources: list[str] = []
+
+    if sprite and os.path.exists(input_path + '.sprite'):
+        sources.append(input_path + '.sprite')
+        found_path = find_in_sprite(input_path + '.sprite', os.path.basename(input_path))
+        if found_path:
+            input_path = os.path.join(os.path.dirname(input_path), os.path.splitext(found_path)[0])
+
+    if os.path.exists(input_path + '.png'):
+        return input_path + '.png', sources + [input_path + '.png']
+    elif os.path.exists(input_path + '.pvr'):
+        sources.append(input_path + '.pvr')
+        if os.path.exists(input_path + '_alpha.pvr'):
+            sources.append(input_path + '_alpha.pvr')
+        return input_path + '.pvr', sources
+    
+    return None, sources
+
+def load_image(image_path: str):
+    if image_path.endswith('.pvr'):
+        return PVR(image_path, external_alpha = True).image
+    
+    return Image.open(image_path)
+
+
+class TextureCache:
+    """Disk cache for decoded textures.
+
+    Image jobs are grouped by texture, so every texture is only decoded once
+    in a run, and nothing is kept in memory after its group is done. If
+    `folder` is set, decoded textures are saved there as raw RGBA so later
+    runs don't have to decode them again. Entries are keyed by the source
+    path, and thrown out when its size or mtime changes. Using an entry
+    touches its mtime, so `prune` can throw out the least recently used ones
+    (including ones for textures that aren't in the game anymore) once the
+    folder is over its size limit.
+    """
+
+    DISK_HEADER = struct.Struct('<4sQQII')
+    DISK_MAGIC = b'RGBA'
+
+    def __init__(self, folder: str | None = None) -> None:
+        self.folder = folder
+
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.folder is not None:
+            os.makedirs(self.folder, exist_ok = True)
+    
+    def get(self, image_path: str) -> Image.Image:
+        path = os.path.realpath(image_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        image = self.load_from_disk(path, version)
+        if image is not None:
+            self.disk_hits += 1
+            return image
+        
+        self.misses += 1
+        image = load_image(image_path)
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        else:
+            image.load()
+        self.save_to_disk(path, version, image)
+        return image
+
+    def disk_path(self, path: str):
+        return os.path.join(self.folder, hashlib.sha1(path.encode()).hexdigest() + '.rgba')
+
+    def load_from_disk(self, path: str, version: tuple[int, int]):
+        if self.folder is None:
+            return None
+        
+        disk_path = self.disk_path(path)
+        try:
+            with open(disk_path, 'rb') as file:
+                magic, mtime, size, width, height = self.DISK_HEADER.unpack(file.read(self.DISK_HEADER.size))
+                if magic != self.DISK_MAGIC or (mtime, size) != version:
+                    return None
+                
+                image = Image.frombytes('RGBA', (width, height), file.read(width * height * 4))
+        except (OSError, ValueError, struct.error):
+            return None
+        
+        with contextlib.suppress(OSError):
+            os.utime(disk_path)
+        return image
+
+    def save_to_disk(self, path: str, version: tuple[int, int], image: Image.Image):
+        if self.folder is None:
+            return
+        
+        disk_path = self.disk_path(path)
+        temp_path = f'{disk_path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(self.DISK_HEADER.pack(self.DISK_MAGIC, *version, image.width, image.height))
+                file.write(image.tobytes())
+            os.replace(temp_path, disk_path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+    
+    def prune(self, max_size: int):
+        """
+        Delete the least recently used entries until the folder is at most
+        `max_size` bytes. Returns `(entries deleted, bytes freed)`.
+        """
+        if self.folder is None:
+            return 0, 0
+        
+        entries = []
+        total = 0
+        with os.scandir(self.folder) as files:
+            for entry in files:
+                if not entry.is_file() or not entry.name.endswith(('.rgba', '.tmp')):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        
+        deleted = 0
+        freed = 0
+        for mtime, size, path in sorted(entries):
+            if total - freed <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            deleted += 1
+            freed += size
+        
+        return deleted, freed
+
+    def stats(self):
+        return {
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+        }
+
+# Every process in the image pool gets its own cache
+texture_cache = TextureCache()
+
+def init_texture_cache(folder: str | None = None):
+    global texture_cache
+    texture_cache = TextureCache(folder)
+
+def init_image_worker(texture_cache_folder: str | None = None):
+    """Set up a process in the image pool."""
+    # forked workers inherit tracemalloc from the profiler, which would only
+    # slow them down, since the profiler can't see their memory anyway
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    init_texture_cache(texture_cache_folder)
+
+
+def extract_texture(image_path: str, jobs: list[tuple[str, list[str]]]):
+    """Decode a texture once, then crop and save every image that uses it.
+
+    This runs inside the image pool, so nothing is printed here. Instead it
+    returns `(results, stats, steps)`, where `results` is a list of
+    `(output_path, error, sources)`. `error` is a formatted traceback and
+    `sources` is the manifest info for the files the image came from. `stats`
+    is how the texture cache was used and how many images reused the
+    texture decoded for the first one, `steps` is how long decoding,
+    hashing, cropping and saving took, and the main process does the
+    reporting.
+    """
+    before = texture_cache.stats()
+    steps = {}
+
+    reused = 0
+
+    try:
+        with time_step(steps, 'decode'):
+            texture = texture_cache.get(image_path)
+    except Exception:
+        error = traceback.format_exc()
+        results = [(output_path, error, None) for output_path, sources in jobs]
+    else:
+        results = [extract_image(texture, output_path, sources, steps) for output_path, sources in jobs]
+        reused = len(jobs) - 1
+    
+    after = texture_cache.stats()
+    stats = {key: after[key] - before[key] for key in after}
+    stats['reused'] = reused
 
+    return results, stats, steps
+
+def extract_image(texture: Image.Image, output_path: str, sources: list[str], steps: dict | None = None):
+    if steps is None:
+        steps = {}
+    
+    try:
+        with time_step(steps, 'hash', len(sources)):
+            sources = {path: file_info(path) for path in sources}
+    except Exception:
+        return output_path, traceback.format_exc(), None
+    
+    image = texture
+    error = None
+    try:
+        with time_step(steps, 'crop'):
+            image = crop_image(texture)
+    except Exception:
+        error = traceback.format_exc()
+    
+    try:
+        with time_step(steps, 'save'):
+            image.save(output_path)
+    except Exception:
+        error = traceback.format_exc()
+    
+    return output_path, error, sources
+
+
+# The stages that gather the game data, in the order they run.
+# `outputs` are the categories each one fills in.
+# `needs` are the stages it reads the output of. If those don't run, their
+# output comes from the existing game-data.json.
+# `updates` are the stages whose objects it adds to (like the inns of the
+# ponies from get_houses), so it has to run again whenever they do.
+STAGES = {
+    'ponies': {
+        'method': 'get_ponies',
+        'outputs': ['ponies'],
+        'needs': [],
+        'updates': [],
+    },
+    'houses': {
+        'method': 'get_houses',
+        'outputs': ['houses', 'shops'],
+        'needs': ['ponies'],
+        'updates': ['ponies'],
+    },
+    'decor': {
+        'method': 'get_decorations',
+        'outputs': ['decor'],
+        'needs': [],
+        'updates': [],
+    },
+    'tokens': {
+        'method': 'get_tokens',
+        'outputs': ['tokens'],
+        'needs': [],
+        'updates': [],
+    },
+    'avatars': {
+        'method': 'get_avatars',
+        'outputs': ['avatars'],
+        'needs': [],
+        'updates': [],
+    },
+    'backgrounds': {
+        'method': 'get_backgrounds',
+        'outputs': ['backgrounds'],
+        'needs': [],
+        'updates': [],
+    },
+    'items': {
+        'method': 'get_items',
+        'outputs': ['items'],
+        'needs': [],
+        'updates': [],
+    },
+    'group_quests': {
+        'method': 'get_group_quests',
+        'outputs': ['group_quests'],
+        'needs': ['ponies'],
+        'updates': ['ponies'],
+    },
+}
+
+def select_stages(only: Iterable[str] | None = None, skip: Iterable[str] | None = None):
+    """
+    Get the stages to run, in order. Stages that update the objects of a
+    selected stage are added, since running that stage throws their changes
+    away. Raises a ValueError if one of them was skipped.
+    """
+    only = list(STAGES) if only is None else list(only)
+    skip = [] if skip is None else list(skip)
+
+    for name in [*only, *skip]:
+        if name not in STAGES:
+            raise ValueError(f'unknown stage {name!r} (stages: {", ".join(STAGES)})')
+    
+    selected = set(only) - set(skip)
+    added = True
+    while added:
+        added = False
+        for name, stage in STAGES.items():
+            if name in selected or not selected.intersection(stage['updates']):
+                continue
+            
+            if name in skip:
+                updated = ', '.join(sorted(selected.intersection(stage['updates'])))
+                raise ValueError(f'{name} has to run again after {updated}, so it can not be skipped')
+            
+            selected.add(name)
+            added = True
+    
+    return [name for name in STAGES if name in selected]
 
 class GetGameData:
     def __init__(
@@ -277,49 +891,103 @@ class GetGameData:
         output_folder: str,
         no_images: bool = False,
         check_wiki: bool = False,
+        jobs: int | None = None,
+        force_images: bool = False,
+        texture_cache_folder: str | None = None,
+        texture_cache_limit: int = 2048,
+        compact: bool = False,
+        wiki_concurrency: int = 4,
+        wiki_rate: float | None = 5,
+        wiki_retries: int = 3,
+        wiki_cache: str | None = None,
+        wiki_ttl: float = 7,
+        wiki_missing_ttl: float = 1,
+        wiki_api: bool = True,
+        profile: bool = False,
+        profile_output: str | None = None,
+        profile_memory: bool = True,
+        profile_cprofile: str | None = None,
+        stages: Iterable[str] | None = None,
+        missing_translations: str | None = None,
     ) -> None:
+        self.profiler = Profiler(
+            enabled = profile,
+            trace_memory = profile_memory,
+            cprofile = profile_cprofile,
+            console = console,
+        )
+        self.profile_output = profile_output
+        self.missing_translations = missing_translations
+        self.compact = compact
+        self.wiki_checker = WikiChecker(
+            concurrency = wiki_concurrency,
+            rate = wiki_rate,
+            retries = wiki_retries,
+            console = console,
+            cache = WikiStatusCache(
+                wiki_cache,
+                positive_ttl = timedelta(days = wiki_ttl),
+                negative_ttl = timedelta(days = wiki_missing_ttl),
+            ) if wiki_cache and check_wiki else None,
+            use_api = wiki_api,
+        )
         self.no_images = no_images
+        self.force_images = force_images
+        self.texture_cache_folder = texture_cache_folder
+        self.texture_cache_limit = texture_cache_limit * 1024 * 1024
         self.check_wiki = check_wiki
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        elif jobs < 1:
+            raise ValueError(f'jobs must be at least 1, not {jobs}')
+        self.jobs = jobs
         self.version = version
         self.game_folder = game_folder
         self.output_folder = output_folder
 
         self.output_game_data = os.path.join(self.output_folder, 'json', 'game-data.json')
+        self.output_game_data_pretty = os.path.join(self.output_folder, 'json', 'game-data.pretty.json')
+        self.shards_folder = os.path.join(self.output_folder, 'json', 'game-data')
+        self.output_search_index = os.path.join(self.output_folder, 'json', 'search-index.json')
         self.images_folder = os.path.join(self.output_folder, 'images')
+        self.image_manifest_path = os.path.join(self.images_folder, 'image-manifest.json')
 
         self.game_data = {}
 
-        self.get_content_version()
-
-        console.print('loading gameobjectdata.xml')
-        self.gameobjectdata = GameObjectData(
-            self.get_game_file('gameobjectdata.xml', 'rb'),
-            self.get_game_file('shopdata.xml', 'rb'),
-            self.get_game_file('gameobjectcategorydata.xml', 'rb'),
-        )
+        with self.profiler.stage('load_xml'):
+            self.get_content_version()
 
-        
-        console.print('Loading loc files')
-        self.loc_files: list[LOC] = [
-            LOC(filename) for filename in glob(os.path.join(game_folder, '*.loc'))
-        ]
+            console.print('loading gameobjectdata.xml')
+            self.gameobjectdata = GameObjectData(
+                self.get_game_file('gameobjectdata.xml', 'rb'),
+                self.get_game_file('shopdata.xml', 'rb'),
+                self.get_game_file('gameobjectcategorydata.xml', 'rb'),
+            )
 
-        self.defaultGameCampaign: DefaultGameCampaignType = json.load(self.get_game_file('defaultGameCampaign.json'))
-        self.daily_goals_shop = {
-            item['item_id']: item['cost']
-            for item in self.defaultGameCampaign.get('mini_games', {}).get('dailygoals', {}).get('itemshop', [])
-        }
+        with self.profiler.stage('load_loc') as stage:
+            console.print('Loading loc files')
+            self.loc_files: list[LOC] = [
+                LOC(filename) for filename in glob(os.path.join(game_folder, '*.loc'))
+            ]
+            stage.count('files', len(self.loc_files))
+
+        with self.profiler.stage('load_campaign'):
+            self.defaultGameCampaign: DefaultGameCampaignType = json.load(self.get_game_file('defaultGameCampaign.json'))
+            self.daily_goals_shop = {
+                item['item_id']: item['cost']
+                for item in self.defaultGameCampaign.get('mini_games', {}).get('dailygoals', {}).get('itemshop', [])
+            }
 
         if len(self.loc_files) == 0:
             raise ValueError('Could not find loc files')
+        
+        with self.profiler.stage('translations') as stage:
+            self.translations = TranslationTable(self.loc_files)
+            stage.count('languages', len(self.translations.languages))
 
         self.migrate = False
-        with open(
-            self.output_game_data,
-            'r',
-            encoding = get_encoding(self.output_game_data),
-        ) as file:
-            self.game_data = json.load(file)
+        with self.profiler.stage('load_game_data'):
+            self.game_data = read_json(self.output_game_data)
         
         if self.game_data.get('file_version', 2) == 1:
             self.migrate = True
@@ -346,22 +1014,192 @@ class GetGameData:
         self.categories = self.game_data.setdefault('categories', {})
 
         self.houses = {}
+        self.image_jobs: dict[str, tuple[str, bool, str]] = {}
+
+        if self.migrate and stages is not None and list(stages) != list(STAGES):
+            console.print('[yellow]migrating game-data.json, running every stage[/]')
+            stages = None
+        self.stages = self.resolve_stages(select_stages(stages))
+        if self.stages != list(STAGES):
+            console.print(f'running {", ".join(self.stages)}')
 
-        self.get_ponies()
-        self.get_houses()
-        self.get_decorations()
-        self.get_tokens()
-        self.get_avatars()
-        self.get_backgrounds()
-        self.get_items()
+        self.load_skipped_stages()
 
-        self.get_group_quests()
+        for name in self.stages:
+            self.run_stage(name)
 
+        if self.check_wiki:
+            with self.profiler.stage('check_wiki') as stage:
+                summary = self.wiki_checker.run()
+                for status, count in summary.items():
+                    stage.count(status, count)
+
+        with self.profiler.stage('extract_images'):
+            self.extract_images()
+
+        self.translations.report_missing(self.missing_translations)
+
+        with self.profiler.stage('save_game_data'):
+            self.save_game_data()
+        
+        self.profiler.finish()
+        self.profiler.report(self.profile_output)
+    
+    def get_output(self, name: str) -> dict | None:
+        """Get the objects of a category (or the group quests) from the game data."""
+        if name == 'group_quests':
+            output = self.game_data.get('group_quests')
+            return None if output is None else output.get('quests')
+        
+        output = self.categories.get(name)
+        return None if output is None else output.get('objects')
+
+    def resolve_stages(self, stages: list[str]):
+        """
+        Add the stages that are needed by the selected ones, but aren't in the
+        existing game data.
+        """
+        while True:
+            missing = [
+                need
+                for name in stages
+                for need in STAGES[name]['needs']
+                if need not in stages
+                and any(self.get_output(output) is None for output in STAGES[need]['outputs'])
+            ]
+            if not missing:
+                return stages
+            
+            for need in dict.fromkeys(missing):
+                console.print(f'{need} is not in {self.output_game_data}, running it too')
+            stages = select_stages([*stages, *missing])
+
+    def load_skipped_stages(self):
+        """
+        Get everything the selected stages need from the stages that are
+        skipped out of the existing game data, so they come out the same as
+        in a full run.
+        """
+        if 'ponies' in self.stages:
+            return
+        
+        ponies = self.get_output('ponies') or {}
+        # the ponies that get_ponies would go through, in the same order
+        game_ponies = [pony.id for pony in self.gameobjectdata['Pony'].values() if pony.id in ponies]
+
+        if 'houses' in self.stages:
+            for pony_id in game_ponies:
+                self.houses.setdefault(ponies[pony_id].get('house'), []).append(pony_id)
+                # get_ponies clears these before get_houses fills them in
+                ponies[pony_id]['inns'] = []
+        
+        if 'group_quests' in self.stages:
+            for pony_id in game_ponies:
+                ponies[pony_id]['pro'] = None
+
+    def run_stage(self, name: str):
+        """Run one of the `get_` methods, and count what it made."""
+        method = getattr(self, STAGES[name]['method'])
+        images = len(self.image_jobs)
+        with self.profiler.stage(method.__name__) as stage:
+            method()
+
+            for output in STAGES[name]['outputs']:
+                stage.count(output, len(self.get_output(output) or {}))
+            
+            stage.count('images', len(self.image_jobs) - images)
+    
+    def save_game_data(self):
         console.print('saving game data')
-        with open(self.output_game_data, 'w', encoding = 'utf-8') as file:
-            json.dump(self.game_data, file, indent = 2, ensure_ascii = False)
+        with self.profiler.step('game-data.json'):
+            write_json(self.output_game_data, self.game_data, self.compact)
+
+        if self.compact:
+            with self.profiler.step('game-data.pretty.json'):
+                write_json(self.output_game_data_pretty, self.game_data)
         
+        with self.profiler.step('shards', len(self.categories)):
+            self.save_shards()
+        with self.profiler.step('search index'):
+            self.save_search_index()
     
+    def save_search_index(self):
+        """
+        Write the normalised names (and alt names) of every object in every
+        language, so the site only has to look names up instead of
+        normalising all of them itself.
+        """
+        index = {
+            'options': SEARCH_OPTIONS,
+            'categories': {},
+        }
+
+        for category_name, category in self.categories.items():
+            clones: dict[str, list[str]] = category.get('clones', {})
+            languages: dict[str, dict[str, list[str]]] = {}
+
+            for id, info in category.get('objects', {}).items():
+                names: dict[str, list[str]] = {}
+                if isinstance(info.get('name'), dict):
+                    for lang, name in info['name'].items():
+                        names.setdefault(lang, []).append(name)
+                if isinstance(info.get('alt_name'), dict):
+                    for lang, alt_names in info['alt_name'].items():
+                        if isinstance(alt_names, str):
+                            alt_names = [alt_names]
+                        names.setdefault(lang, []).extend(alt_names)
+                
+                ids = [id, *clones.get(id, [])]
+                for lang, lang_names in names.items():
+                    lang_index = languages.setdefault(lang, {})
+                    for name in lang_names:
+                        name = search_name(name)
+                        if not name:
+                            continue
+                        
+                        matches = lang_index.setdefault(name, [])
+                        matches.extend(match for match in ids if match not in matches)
+            
+            if languages:
+                index['categories'][category_name] = languages
+        
+        write_json(self.output_search_index, index, True)
+    
+    def save_shards(self):
+        """
+        Write every category (and the group quests) to its own file, plus a
+        manifest so the site can fetch only the parts it needs.
+        """
+        os.makedirs(self.shards_folder, exist_ok = True)
+
+        shards = {
+            name: (category, category.get('objects', {}))
+            for name, category in self.categories.items()
+        }
+        if 'group_quests' in self.game_data:
+            shards['group_quests'] = (
+                self.game_data['group_quests'],
+                self.game_data['group_quests'].get('quests', {}),
+            )
+        
+        manifest = {
+            'file_version': self.game_data['file_version'],
+            'game_version': self.game_data['game_version'],
+            'content_version': self.game_data['content_version'],
+            'shards': {},
+        }
+
+        for name, (shard, objects) in shards.items():
+            path = os.path.join(self.shards_folder, f'{name}.json')
+            info = write_json(path, shard, self.compact)
+            manifest['shards'][name] = {
+                'path': '/' + normalize_path(os.path.relpath(path)),
+                'count': len(objects),
+                **info,
+            }
+        
+        write_json(os.path.join(self.shards_folder, 'manifest.json'), manifest)
+
     def get_game_file(
         self,
         path: str,
@@ -380,14 +1218,13 @@ class GetGameData:
             file_path,
             'rb',
         ) as file:
-            if 'b' not in mode and encoding is None:
-                encoding = charset_normalizer.from_fp(file).best().encoding
-                file.seek(0)
+            data = file.read()
 
-            if 'b' in mode:
-                result = io.BytesIO(file.read())
-            else:
-                result = io.StringIO(file.read().decode(encoding), newline = newline)
+        if 'b' in mode:
+            result = io.BytesIO(data)
+        else:
+            encoding = get_encoding(file_path, data, encoding)
+            result = io.StringIO(data.decode(encoding), newline = newline)
         
         return result
 
@@ -395,36 +1232,238 @@ class GetGameData:
         self.content_version = parse_xml(self.get_game_file('data_ver.xml', 'rb'))[0].attrib['Value']
         return self.content_version
 
-    def save_image(self, input_path: str, output_path: str):
-        if os.path.exists(input_path + '.sprite'):
-            found_path = find_in_sprite(input_path + '.sprite', os.path.basename(input_path))
-            if found_path:
-                input_path = os.path.join(os.path.dirname(input_path), os.path.splitext(found_path)[0])
+    def save_image(
+        self,
+        input_path: str,
+        output_path: str,
+        name: str | None = None,
+        sprite: bool = True,
+    ):
+        """
+        Queue an image to be extracted. The actual decoding, cropping and
+        saving happens in `extract_images`, once all the objects are gathered.
+        """
+        if name is None:
+            name = f'{os.path.basename(output_path)} image'
+        
+        self.image_jobs[output_path] = (input_path, sprite, name)
+
+    def load_image_manifest(self):
+        self.image_manifest = {}
 
+        if os.path.isfile(self.image_manifest_path):
+            try:
+                with open(self.image_manifest_path, 'r', encoding = 'utf-8') as file:
+                    manifest = json.load(file)
+            except ValueError:
+                manifest = None
+            
+            if not isinstance(manifest, dict):
+                console.print('could not read the image manifest, extracting all images')
+            elif manifest.get('settings') == IMAGE_SETTINGS:
+                self.image_manifest = manifest.get('images', {})
+            else:
+                console.print('image settings changed, extracting all images')
         
-        image = None
-        if os.path.exists(input_path + '.png'):
-            image = Image.open(input_path + '.png')
-        elif os.path.exists(input_path + '.pvr'):
-            image = PVR(input_path + '.pvr', external_alpha = True).image
-        else:
-            console.print(f'could not find {os.path.basename(output_path)} image')
+        return self.image_manifest
+
+    def save_image_manifest(self):
+        os.makedirs(self.images_folder, exist_ok = True)
+        write_json(
+            self.image_manifest_path,
+            {
+                'settings': IMAGE_SETTINGS,
+                'images': dict(sorted(self.image_manifest.items())),
+            },
+        )
     
-        if image is not None:
+    def manifest_key(self, output_path: str):
+        return normalize_path(os.path.relpath(output_path, self.images_folder))
+
+    def source_key(self, source_path: str):
+        return normalize_path(os.path.relpath(source_path, self.game_folder))
+
+    def image_is_current(self, output_path: str, input_path: str, sprite: bool, sources: list[str]):
+        """
+        Check the manifest to see if an image would come out the same as the
+        one that's already saved. Sources are compared by size and mtime
+        first, and only hashed if the mtime changed (like a freshly extracted
+        game folder).
+        """
+        entry = self.image_manifest.get(self.manifest_key(output_path))
+
+        if entry is None or not os.path.isfile(output_path):
+            return False
+        
+        if entry.get('input') != self.source_key(input_path) or entry.get('sprite') != sprite:
+            return False
+
+        if list(entry.get('sources', {})) != [self.source_key(path) for path in sources]:
+            return False
+        
+        for path, info in entry['sources'].items():
+            source_path = os.path.join(self.game_folder, path)
             try:
-                image = crop_image(image)
-                image.save(output_path)
-            except Exception as e:
-                e.add_note(f'image: {input_path}')
-                console.print_exception(
-                    show_locals = True
-                )
-                image.save(output_path)
+                current = file_info(source_path, hash = False)
+            except OSError:
+                return False
+            
+            if current['size'] != info['size']:
+                return False
+            if current['mtime'] == info['mtime']:
+                continue
+            
+            current = file_info(source_path)
+            if current['hash'] != info['hash']:
+                return False
+            info['mtime'] = current['mtime']
+        
+        return True
+
+    def extract_images(self):
+        if not self.image_jobs:
+            return
+        
+        jobs = self.image_jobs
+        self.image_jobs = {}
+
+        self.load_image_manifest()
+
+        resolved: dict[str, tuple[str, list[str]]] = {}
+        skipped = 0
+        with self.profiler.step('resolve', len(jobs)):
+            for output_path, (input_path, sprite, name) in jobs.items():
+                image_path, sources = resolve_image(input_path, sprite)
+                if image_path is None:
+                    console.print(f'could not find {name}')
+                    self.image_manifest.pop(self.manifest_key(output_path), None)
+                    continue
+                
+                if not self.force_images and self.image_is_current(output_path, input_path, sprite, sources):
+                    skipped += 1
+                    continue
+                
+                resolved[output_path] = (image_path, sources)
+        
+        console.print(f'{skipped} images unchanged, {len(resolved)} to extract')
+        self.profiler.count('unchanged', skipped)
+        self.profiler.count('extracted', len(resolved))
+
+        try:
+            self.run_image_jobs(jobs, resolved)
+        finally:
+            self.save_image_manifest()
+        
+        if self.texture_cache_folder is not None:
+            deleted, freed = TextureCache(self.texture_cache_folder).prune(self.texture_cache_limit)
+            if deleted:
+                console.print(f'deleted {deleted} textures ({freed / 1024 / 1024:.0f}MB) from the texture cache')
+
+    def run_image_jobs(
+        self,
+        jobs: dict[str, tuple[str, bool, str]],
+        resolved: dict[str, tuple[str, list[str]]],
+    ):
+        if not resolved:
+            return
+        
+        textures: dict[str, list[tuple[str, list[str]]]] = {}
+        for output_path, (image_path, sources) in resolved.items():
+            textures.setdefault(image_path, []).append((output_path, sources))
+        
+        cache_stats = {
+            'reused': 0,
+            'disk_hits': 0,
+            'misses': 0,
+        }
+
+        def results(tasks: Iterable[tuple[list, dict, dict]]):
+            for task_results, stats, steps in tasks:
+                for key, value in stats.items():
+                    cache_stats[key] += value
+                self.profiler.add_steps(steps)
+                yield from task_results
+
+        if self.jobs <= 1:
+            init_texture_cache(self.texture_cache_folder)
+            tasks = (
+                extract_texture(image_path, texture_jobs)
+                for image_path, texture_jobs in textures.items()
+            )
+            description = 'Extracting images...'
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers = self.jobs,
+                initializer = init_image_worker,
+                initargs = (self.texture_cache_folder,),
+            )
+            futures = {
+                executor.submit(extract_texture, image_path, texture_jobs): texture_jobs
+                for image_path, texture_jobs in textures.items()
+            }
+
+            def tasks_from_futures():
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except Exception:
+                        error = traceback.format_exc()
+                        yield [(output_path, error, None) for output_path, sources in futures[future]], {}, {}
+            
+            tasks = tasks_from_futures()
+            description = f'Extracting images ({self.jobs} jobs)...'
+
+        try:
+            for output_path, error, sources in track(
+                results(tasks),
+                description = description,
+                total = len(resolved),
+            ):
+                self.report_image(output_path, jobs[output_path], error, sources)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures = True)
+        
+        console.print(
+            f'textures: {cache_stats["disk_hits"]} from the texture cache, {cache_stats["misses"]} decoded, '
+            f'reused for {cache_stats["reused"]} more images ({len(textures)} textures for {len(resolved)} images)'
+        )
+        self.profiler.count('textures', len(textures))
+        self.profiler.count('decoded', cache_stats['misses'])
+    
+    def report_image(
+        self,
+        output_path: str,
+        job: tuple[str, bool, str],
+        error: str | None,
+        sources: dict | None,
+    ):
+        input_path, sprite, name = job
+        key = self.manifest_key(output_path)
+
+        if error is not None:
+            console.print(f'[red]failed to extract {name}[/]')
+            console.print(f'image: {input_path}')
+            console.print(error, markup = False, highlight = False)
+        
+        if error is not None or sources is None:
+            self.image_manifest.pop(key, None)
+            return
+        
+        self.image_manifest[key] = {
+            'input': self.source_key(input_path),
+            'sprite': sprite,
+            'sources': {
+                self.source_key(path): info
+                for path, info in sources.items()
+            },
+        }
 
     def get_ponies(self):
         self.categories.setdefault('ponies', {})
 
-        self.categories['ponies']['name'] = translate('STR_STORE_PONIES', self.loc_files)
+        self.categories['ponies']['name'] = translate('STR_STORE_PONIES', self.translations)
         self.categories['ponies'].setdefault('clones', {})
 
         self.categories['ponies'] = {
@@ -493,14 +1532,14 @@ class GetGameData:
 
                 pony_info['name'] = translate(
                     pony.get('Name', {}).get('Unlocal', ''),
-                    self.loc_files,
+                    self.translations,
                     pony_info.setdefault('name', {}),
                     pony_info.get('locked', False),
                 )
 
                 pony_info['description'] = translate(
                     pony.get('Description', {}).get('Unlocal', ''),
-                    self.loc_files,
+                    self.translations,
                     pony_info.setdefault('description', {}),
                     pony_info.get('locked', False),
                 )
@@ -525,19 +1564,12 @@ class GetGameData:
                 portrait_image_source = os.path.join(self.game_folder, portrait_image_name)
 
                 if not self.no_images:
-                    portrait_image = None
-                    if os.path.exists(portrait_image_source + '.png'):
-                        portrait_image = Image.open(portrait_image_source + '.png')
-                    elif os.path.exists(portrait_image_source + '.pvr'):
-                        portrait_image = PVR(portrait_image_source + '.pvr', external_alpha = True).image
-                    else:
-                        console.print(f'could not find {pony.id} portrait')
-                
-                    if portrait_image is not None:
-                        portrait_image = crop_image(portrait_image)
-                        portrait_image.save(portrait_image_path)
-                    
-                
+                    self.save_image(
+                        portrait_image_source,
+                        portrait_image_path,
+                        f'{pony.id} portrait',
+                        sprite = False,
+                    )
 
                 full_image_path = normalize_path(os.path.relpath(os.path.join(self.images_folder, 'ponies', 'full', f'{pony.id}.png')))
                 images['full'] = '/' + full_image_path
@@ -546,17 +1578,12 @@ class GetGameData:
                 full_image_source = os.path.join(self.game_folder, full_image_name)
 
                 if not self.no_images:
-                    full_image = None
-                    if os.path.exists(full_image_source + '.png'):
-                        full_image = Image.open(full_image_source + '.png')
-                    elif os.path.exists(full_image_source + '.pvr'):
-                        full_image = PVR(full_image_source + '.pvr', external_alpha = True).image
-                    else:
-                        console.print(f'could not find {pony.id} full image')
-                
-                    if full_image is not None:
-                        full_image = crop_image(full_image)
-                        full_image.save(full_image_path)
+                    self.save_image(
+                        full_image_source,
+                        full_image_path,
+                        f'{pony.id} full image',
+                        sprite = False,
+                    )
 
                 # more metadata
                 
@@ -665,6 +1692,7 @@ class GetGameData:
                     wiki_path,
                     pony_info.get('wiki'),
                     self.check_wiki,
+                    self.wiki_checker,
                 )
 
                 ponies[pony.id] = {
@@ -708,7 +1736,7 @@ class GetGameData:
         houses = self.categories['houses'].setdefault('objects', {})
 
         self.categories.setdefault('shops', {})
-        self.categories['shops']['name'] = translate('STR_STORE_SHOPS', self.loc_files)
+        self.categories['shops']['name'] = translate('STR_STORE_SHOPS', self.translations)
         shops = self.categories['shops'].setdefault('objects', {})
 
         os.makedirs(os.path.join(self.images_folder, 'houses'), exist_ok = True)
@@ -744,7 +1772,7 @@ class GetGameData:
                 
                 house_info['name'] = translate(
                     house.get('Name', {}).get('Unlocal', house.id),
-                    self.loc_files,
+                    self.translations,
                     house_info.setdefault('name', {}),
                     house_info.get('locked', False),
                 )
@@ -812,7 +1840,7 @@ class GetGameData:
 
                         product['name'] = translate(
                             consumable.get('Name', {}).get('Unlocal', ''),
-                            self.loc_files,
+                            self.translations,
                             product.setdefault('name', {}),
                             house_info.get('locked', False),
                         )
@@ -901,7 +1929,7 @@ class GetGameData:
         self.categories.setdefault('decor', {})
         self.categories['decor']['name'] = translate(
             'STR_STORE_DECOR',
-            self.loc_files,
+            self.translations,
             self.categories['decor'].get('name', {}),
         )
         decors = self.categories['decor'].setdefault('objects', {})
@@ -919,7 +1947,7 @@ class GetGameData:
             
             decor_info['name'] = translate(
                 decor.get('Name', {}).get('Unlocal', decor.id),
-                self.loc_files,
+                self.translations,
                 decor_info.get('name', {}),
                 decor_info.get('locked', False),
             )
@@ -995,7 +2023,7 @@ class GetGameData:
         self.categories.setdefault('tokens', {})
         self.categories['tokens']['name'] = translate(
             'STR_HELP_PONY_TASKS_TASKS',
-            self.loc_files,
+            self.translations,
             self.categories['tokens'].get('name', {}),
         )
         tokens = self.categories['tokens'].setdefault('objects', {})
@@ -1016,7 +2044,7 @@ class GetGameData:
 
             token_info['name'] = translate(
                 QuestSpecialItem.get('Name', token.id),
-                self.loc_files,
+                self.translations,
                 token_info.get('name', {}),
                 token_info.get('locked', False),
             )
@@ -1051,7 +2079,7 @@ class GetGameData:
             item = items.setdefault(id, {})
             item['name'] = translate(
                 config['loc_string'],
-                self.loc_files,
+                self.translations,
                 item.get('name', {}),
             )
 
@@ -1073,7 +2101,7 @@ class GetGameData:
         self.game_data.setdefault('group_quests', {})
         self.game_data['group_quests']['name'] = translate(
             'STR_GQ_ACTIVITIES_MENU_BUTTON',
-            self.loc_files,
+            self.translations,
             self.game_data['group_quests'].get('name', {}),
         )
         random_pros = self.game_data['group_quests']['random_pros'] = self.defaultGameCampaign.get('group_quests', {}).get('random_pros', [])
@@ -1087,11 +2115,11 @@ class GetGameData:
             group_quest = {
                'name': translate(
                     quest_data['Name'],
-                    self.loc_files,
+                    self.translations,
                 ),
                 'description': translate(
                     quest_data['Description'],
-                    self.loc_files,
+                    self.translations,
                 ),
                 'pros': [],
             }
@@ -1114,7 +2142,7 @@ class GetGameData:
         self.categories.setdefault('avatars', {})
         self.categories['avatars']['name'] = translate(
             'STR_AVATAR_ICONS',
-            self.loc_files,
+            self.translations,
             self.categories['avatars'].get('name', {}),
         )
 
@@ -1136,7 +2164,7 @@ class GetGameData:
             
             avatar_info['name'] = translate(
                 avatar.get('Shop', {}).get('Label', avatar.id),
-                self.loc_files,
+                self.translations,
                 avatar_info.get('name', {}),
                 avatar_info.get('locked', False),
             )
@@ -1168,7 +2196,7 @@ class GetGameData:
         self.categories.setdefault('backgrounds', {})
         self.categories['backgrounds']['name'] = translate(
             'STR_STORE_BACKGROUNDS',
-            self.loc_files,
+            self.translations,
             self.categories['backgrounds'].get('name', {}),
         )
 
@@ -1190,7 +2218,7 @@ class GetGameData:
             
             background_info['name'] = translate(
                 background.get('Shop', {}).get('Label', background.id),
-                self.loc_files,
+                self.translations,
                 background_info.get('name', {}),
                 background_info.get('locked', False),
             )
@@ -1255,14 +2283,175 @@ def main():
         action = 'store_true',
     )
 
+    argparser.add_argument(
+        '-j', '--jobs',
+        help = 'Number of processes used to extract images, 1 to extract them in this process (default: number of cpus)',
+        type = positive_int,
+        default = None,
+    )
+
+    argparser.add_argument(
+        '-fi', '--force-images',
+        help = 'Extract all images, even if they have not changed since the last run',
+        action = 'store_true',
+    )
+
+    argparser.add_argument(
+        '--texture-cache',
+        metavar = 'FOLDER',
+        help = 'Keep decoded textures in this folder to reuse them in later runs',
+        default = None,
+    )
+
+    argparser.add_argument(
+        '--texture-cache-limit',
+        metavar = 'MB',
+        help = 'Size limit of the --texture-cache folder. The least recently used textures are deleted after every run to stay under it (default: %(default)s)',
+        type = int,
+        default = 2048,
+    )
+
+    argparser.add_argument(
+        '-c', '--compact',
+        help = 'Write game-data.json without any whitespace, and put an indented copy in game-data.pretty.json',
+        action = 'store_true',
+    )
+
+    argparser.add_argument(
+        '--wiki-concurrency',
+        metavar = 'N',
+        help = 'Number of requests to make to each wiki at once (default: %(default)s)',
+        type = int,
+        default = 4,
+    )
+
+    argparser.add_argument(
+        '--wiki-rate',
+        metavar = 'RPS',
+        help = 'Maximum requests per second to each wiki, 0 for no limit (default: %(default)s)',
+        type = float,
+        default = 5,
+    )
+
+    argparser.add_argument(
+        '--wiki-retries',
+        metavar = 'N',
+        help = 'Times to retry a wiki request that failed (default: %(default)s)',
+        type = int,
+        default = 3,
+    )
+
+    argparser.add_argument(
+        '--wiki-cache',
+        metavar = 'FILE',
+        help = 'Wiki status cache file, empty to not use one (default: %(default)s)',
+        default = '.wiki-status-cache.json',
+    )
+
+    argparser.add_argument(
+        '--wiki-ttl',
+        metavar = 'DAYS',
+        help = 'How long pages that exist stay cached (default: %(default)s)',
+        type = float,
+        default = 7,
+    )
+
+    argparser.add_argument(
+        '--wiki-missing-ttl',
+        metavar = 'DAYS',
+        help = 'How long missing pages stay cached (default: %(default)s)',
+        type = float,
+        default = 1,
+    )
+
+    argparser.add_argument(
+        '--wiki-no-api',
+        help = 'Check every wiki page with a HEAD request instead of batching them through api.php',
+        action = 'store_true',
+    )
+
+    argparser.add_argument(
+        '--profile',
+        metavar = 'FILE',
+        nargs = '?',
+        const = 'profile.json',
+        help = 'Time every stage, print a summary and save a JSON report to FILE (default: %(const)s)',
+        default = None,
+    )
+
+    argparser.add_argument(
+        '--profile-no-memory',
+        help = "Don't trace memory while profiling. tracemalloc slows the Python parts down, so the times are closer to a normal run without it",
+        action = 'store_true',
+    )
+
+    argparser.add_argument(
+        '--cprofile',
+        metavar = 'FILE',
+        help = 'Run every stage under cProfile, and save the stats of the slowest one to FILE (implies --profile)',
+        default = None,
+    )
+
+    argparser.add_argument(
+        '--missing-translations',
+        metavar = 'FILE',
+        help = 'Save every key that is missing a translation to FILE, as {language: [key, ...]}',
+        default = None,
+    )
+
+    argparser.add_argument(
+        '--only',
+        metavar = 'STAGE',
+        nargs = '+',
+        choices = list(STAGES),
+        help = 'Only run these stages, and keep everything else from the existing game data (stages: %(choices)s)',
+        default = None,
+    )
+
+    argparser.add_argument(
+        '--skip',
+        metavar = 'STAGE',
+        nargs = '+',
+        choices = list(STAGES),
+        help = 'Keep these stages from the existing game data instead of running them. houses and group_quests can only be skipped if ponies is skipped too, since they fill in the pony objects',
+        default = None,
+    )
+
     args = argparser.parse_args()
 
+    stages = None
+    if args.only is not None or args.skip is not None:
+        try:
+            stages = select_stages(args.only, args.skip)
+        except ValueError as e:
+            argparser.error(str(e))
+
+    profile = args.profile is not None or args.cprofile is not None
+
     GetGameData(
         args.version,
         args.game_folder,
         args.output,
         args.no_images,
         args.wiki_status,
+        args.jobs,
+        args.force_images,
+        args.texture_cache,
+        args.texture_cache_limit,
+        args.compact,
+        args.wiki_concurrency,
+        args.wiki_rate,
+        args.wiki_retries,
+        args.wiki_cache,
+        args.wiki_ttl,
+        args.wiki_missing_ttl,
+        not args.wiki_no_api,
+        profile,
+        args.profile,
+        not args.profile_no_memory,
+        args.cprofile,
+        stages,
+        args.missing_translations,
     )
 
     return
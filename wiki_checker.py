@@ -0,0 +1,556 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import requests.adapters
+from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+)
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# servers that don't do HEAD answer with these, so the page is requested with GET
+HEAD_NOT_ALLOWED = (405, 501)
+
+# MediaWiki only lets normal users query 50 titles at once
+API_BATCH_SIZE = 50
+
+STATUS_CODES = {
+    'exists': 200,
+    'redirect': 301,
+    'missing': 404,
+}
+
+def apply_status(page_result: dict, status_code: int):
+    """Record the result of checking a page the same way check_wiki always has."""
+    if status_code == 301:
+        page_result['exists'] = True
+        page_result['redirect'] = True
+    elif status_code == 200:
+        page_result['exists'] = True
+        page_result['redirect'] = False
+    else:
+        page_result['exists'] = False
+        page_result['redirect'] = False
+        page_result['timestamp'] = datetime.now().timestamp()
+
+
+def resolve_titles(titles: list[str], data: dict) -> dict[str, str]:
+    """
+    Get the status of each title from a MediaWiki `action=query` response.
+    Titles that aren't in the response are left out.
+    """
+    query = data.get('query', {})
+    normalized = {item['from']: item['to'] for item in query.get('normalized', [])}
+    redirects = {item['from']: item['to'] for item in query.get('redirects', [])}
+
+    pages = query.get('pages', [])
+    if isinstance(pages, dict):
+        pages = pages.values()
+    pages = {page.get('title'): page for page in pages}
+
+    result = {}
+    for title in titles:
+        name = normalized.get(title, title)
+        if name in redirects:
+            result[title] = 'redirect'
+            continue
+
+        page = pages.get(name)
+        if page is None:
+            continue
+
+        if 'known' in page or ('missing' not in page and 'invalid' not in page):
+            result[title] = 'exists'
+        else:
+            result[title] = 'missing'
+
+    return result
+
+
+def page_status(page_result: dict):
+    if not page_result.get('exists', False):
+        return 'missing'
+    return 'redirect' if page_result.get('redirect', False) else 'exists'
+
+
+class WikiStatusCache:
+    """On disk cache of wiki page statuses.
+
+    Entries are keyed by `wiki:path`, and keep the status of the page, when it
+    was checked, and the ETag and Last-Modified headers so stale entries can
+    be revalidated with a conditional request. Pages that exist (or redirect)
+    are fresh for `positive_ttl`, and missing pages for `negative_ttl`.
+    """
+    def __init__(
+        self,
+        path: str,
+        positive_ttl: timedelta = timedelta(days = 7),
+        negative_ttl: timedelta = timedelta(days = 1),
+    ) -> None:
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.entries: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        if os.path.isfile(self.path):
+            with open(self.path, 'r', encoding = 'utf-8') as file:
+                self.entries = json.load(file).get('pages', {})
+
+        return self.entries
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        temp_path = self.path + '.tmp'
+        with self.lock:
+            pages = dict(sorted(self.entries.items()))
+        try:
+            with open(temp_path, 'w', encoding = 'utf-8') as file:
+                json.dump({'pages': pages}, file, indent = 2)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def is_fresh(self, key: str):
+        entry = self.get(key)
+        if entry is None:
+            return False
+
+        ttl = self.negative_ttl if entry['status'] == 'missing' else self.positive_ttl
+        return datetime.now() - datetime.fromtimestamp(entry.get('checked', 0)) < ttl
+
+    def headers(self, key: str):
+        """Headers for a conditional request, if there's anything to revalidate."""
+        entry = self.get(key)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    def update(self, key: str, url: str, status: str, response: requests.Response | None = None):
+        with self.lock:
+            entry = self.entries.setdefault(key, {})
+            entry['url'] = url
+            entry['status'] = status
+            entry['checked'] = datetime.now().timestamp()
+            if response is not None and response.status_code != 304:
+                entry['etag'] = response.headers.get('ETag')
+                entry['last_modified'] = response.headers.get('Last-Modified')
+
+    def expire(self, patterns: list[str] | None = None, status: str | None = None):
+        """
+        Mark entries as stale, so they get revalidated next time. `patterns`
+        are glob patterns matched against the keys (`wiki:path`). Returns how
+        many entries were expired.
+        """
+        count = 0
+        with self.lock:
+            for key, entry in self.entries.items():
+                if patterns and not any(fnmatchcase(key, pattern) for pattern in patterns):
+                    continue
+                if status is not None and entry.get('status') != status:
+                    continue
+
+                entry['checked'] = 0
+                count += 1
+
+        return count
+
+
+class RateLimiter:
+    """Spaces out calls to `wait` so there are at most `rate` per second."""
+    def __init__(self, rate: float | None = None) -> None:
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class WikiChecker:
+    """Check whether wiki pages exist, concurrently.
+
+    Pages are queued with `add`, then checked when `run` is called. Every wiki
+    host gets its own pool of `concurrency` threads, each with a keep-alive
+    session, and requests to a host are limited to `rate` per second. Requests
+    that fail or get a 429/5xx are retried `retries` times, with exponential
+    backoff starting at `backoff` seconds.
+
+    If there's a `cache`, pages with a fresh entry aren't requested at all,
+    and stale ones are revalidated with a conditional request.
+
+    Pages added with an `api_url` (a MediaWiki api.php) are checked
+    `API_BATCH_SIZE` titles at a time with `action=query` instead. If the api
+    doesn't work, they fall back to a HEAD request each.
+    """
+    def __init__(
+        self,
+        concurrency: int = 4,
+        rate: float | None = 5,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30,
+        console: Console | None = None,
+        cache: WikiStatusCache | None = None,
+        use_api: bool = True,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.console = console or Console()
+        self.cache = cache
+        self.cached = 0
+        self.use_api = use_api
+
+        self.pages: dict[str, list[tuple[str, dict, str | None, str | None, str | None]]] = {}
+        self.limiters: dict[str, RateLimiter] = {}
+        self.broken_apis: set[str] = set()
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def add(
+        self,
+        url: str,
+        page_result: dict,
+        key: str | None = None,
+        api_url: str | None = None,
+        title: str | None = None,
+    ):
+        if self.cache is not None and key is not None and self.cache.is_fresh(key):
+            entry = self.cache.get(key)
+            apply_status(page_result, STATUS_CODES[entry['status']])
+            if entry['status'] == 'missing':
+                page_result['timestamp'] = entry['checked']
+            self.cached += 1
+            return
+
+        host = urlsplit(url).netloc
+        self.pages.setdefault(host, []).append((url, page_result, key, api_url, title))
+
+    def __len__(self):
+        return sum(len(pages) for pages in self.pages.values())
+
+    def get_session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections = 4,
+                pool_maxsize = self.concurrency,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+        return session
+
+    def request(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        method: str = 'HEAD',
+        params: dict[str, str] | None = None,
+        stream: bool = False,
+    ):
+        """Request a url, retrying on errors. Returns the response, or None if it never worked.
+
+        With `stream`, the body isn't read, and the response has to be closed.
+        """
+        limiter = self.limiters.setdefault(urlsplit(url).netloc, RateLimiter(self.rate))
+
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            limiter.wait()
+            with self.lock:
+                self.requests += 1
+            try:
+                response = self.get_session().request(
+                    method,
+                    url,
+                    headers = headers,
+                    params = params,
+                    allow_redirects = False,
+                    timeout = self.timeout,
+                    stream = stream,
+                )
+            except requests.RequestException as e:
+                if attempt >= self.retries:
+                    self.console.print(f'[red]could not check [blue]{url}[/]: {e}')
+                    return None
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                response.close()
+                if attempt >= self.retries:
+                    self.console.print(f'[red]could not check [blue]{url}[/]: {response.status_code}')
+                    return None
+
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+
+            time.sleep(delay)
+
+        return None
+
+    def check_one(self, url: str, page_result: dict, key: str | None = None):
+        return [self.check(url, page_result, key)]
+
+    def check(self, url: str, page_result: dict, key: str | None = None):
+        use_cache = self.cache is not None and key is not None
+        headers = self.cache.headers(key) if use_cache else {}
+
+        response = self.request(url, headers)
+        if response is not None and response.status_code in HEAD_NOT_ALLOWED:
+            # only the status is needed, so don't download the page
+            response = self.request(url, headers, method = 'GET', stream = True)
+            if response is not None:
+                response.close()
+        if response is None:
+            return 'error'
+
+        status_code = response.status_code
+        entry = self.cache.get(key) if use_cache else None
+        if status_code == 304 and entry is not None:
+            status_code = STATUS_CODES[entry['status']]
+
+        apply_status(page_result, status_code)
+        status = page_status(page_result)
+        if use_cache:
+            self.cache.update(key, url, status, response)
+
+        if response.status_code == 304:
+            return 'unchanged'
+        if status == 'missing':
+            self.console.print(f'[red]no page for [blue]{url}[/]')
+
+        return status
+
+    def check_batch(self, api_url: str, pages: list[tuple[str, dict, str | None, str | None]]):
+        """Check a batch of pages with one api query. Returns the status of each page."""
+        statuses = None
+        if api_url not in self.broken_apis:
+            statuses = self.query_api(api_url, [title for url, page_result, key, title in pages])
+
+        if statuses is None:
+            return [self.check(url, page_result, key) for url, page_result, key, title in pages]
+
+        results = []
+        for url, page_result, key, title in pages:
+            status = statuses.get(title)
+            if status is None:
+                results.append(self.check(url, page_result, key))
+                continue
+
+            apply_status(page_result, STATUS_CODES[status])
+            if self.cache is not None and key is not None:
+                self.cache.update(key, url, status)
+            if status == 'missing':
+                self.console.print(f'[red]no page for [blue]{url}[/]')
+            results.append(status)
+
+        return results
+
+    def query_api(self, api_url: str, titles: list[str]):
+        """
+        Get the status of some titles from a MediaWiki api. Returns None if the
+        api doesn't work, and stops using it for the rest of the run.
+        """
+        response = self.request(
+            api_url,
+            method = 'GET',
+            params = {
+                'action': 'query',
+                'titles': '|'.join(titles),
+                'redirects': '1',
+                'format': 'json',
+                'formatversion': '2',
+            },
+        )
+
+        try:
+            if response is None or response.status_code != 200:
+                raise ValueError(f'status {response.status_code if response is not None else None}')
+            data = response.json()
+            if 'query' not in data:
+                raise ValueError(data.get('error', {}).get('info', 'no query in response'))
+        except ValueError as e:
+            if api_url not in self.broken_apis:
+                self.broken_apis.add(api_url)
+                self.console.print(f'[red]{api_url} does not work ({e}), falling back to HEAD requests[/]')
+            return None
+
+        return resolve_titles(titles, data)
+
+    def run(self):
+        """Check every queued page. Returns a summary of the results."""
+        summary = {
+            'exists': 0,
+            'redirect': 0,
+            'missing': 0,
+            'unchanged': 0,
+            'error': 0,
+            'cached': self.cached,
+        }
+
+        pages = self.pages
+        self.pages = {}
+        self.cached = 0
+        total = sum(len(host_pages) for host_pages in pages.values())
+        if not total:
+            if summary['cached']:
+                self.console.print(f'all {summary["cached"]} wiki pages are cached')
+            return summary
+
+        start = time.perf_counter()
+        requests_before = self.requests
+        executors = []
+        futures = []
+        try:
+            for host, host_pages in pages.items():
+                self.limiters.setdefault(host, RateLimiter(self.rate))
+                executor = ThreadPoolExecutor(
+                    max_workers = self.concurrency,
+                    thread_name_prefix = f'wiki-{host}',
+                )
+                executors.append(executor)
+
+                batches: dict[str, list[tuple[str, dict, str | None, str | None]]] = {}
+                for url, page_result, key, api_url, title in host_pages:
+                    if api_url is None or title is None:
+                        futures.append(executor.submit(self.check_one, url, page_result, key))
+                    else:
+                        batches.setdefault(api_url, []).append((url, page_result, key, title))
+
+                for api_url, batch_pages in batches.items():
+                    for index in range(0, len(batch_pages), API_BATCH_SIZE):
+                        futures.append(executor.submit(
+                            self.check_batch,
+                            api_url,
+                            batch_pages[index:index + API_BATCH_SIZE],
+                        ))
+
+            progress = Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                MofNCompleteColumn(),
+                TimeRemainingColumn(),
+                console = self.console,
+            )
+            with progress:
+                task = progress.add_task('Checking wikis...', total = total)
+                for future in as_completed(futures):
+                    results = future.result()
+                    for status in results:
+                        summary[status] += 1
+                    progress.advance(task, len(results))
+        finally:
+            for executor in executors:
+                executor.shutdown(cancel_futures = True)
+            if self.cache is not None:
+                self.cache.save()
+
+        elapsed = time.perf_counter() - start
+        self.console.print(
+            f'checked {total} wiki pages with {self.requests - requests_before} requests in {elapsed:.1f}s: '
+            f'{summary["exists"]} exist, {summary["redirect"]} redirect, '
+            f'{summary["missing"]} missing, {summary["unchanged"]} unchanged, '
+            f'{summary["error"]} failed ({summary["cached"]} cached)'
+        )
+
+        return summary
+
+
+if __name__ == '__main__':
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description = 'Manage the wiki status cache',
+    )
+
+    argparser.add_argument(
+        '-c', '--cache',
+        help = 'Wiki status cache file (default: %(default)s)',
+        default = '.wiki-status-cache.json',
+    )
+
+    subparsers = argparser.add_subparsers(dest = 'command', required = True)
+
+    expire_parser = subparsers.add_parser(
+        'expire',
+        help = 'Mark entries as stale so they get checked on the next run',
+    )
+    expire_parser.add_argument(
+        'patterns',
+        nargs = '*',
+        help = 'Glob patterns to match against "wiki:path" keys, like "fandom:*" (default: everything)',
+    )
+    expire_parser.add_argument(
+        '-s', '--status',
+        choices = list(STATUS_CODES),
+        help = 'Only expire entries with this status',
+    )
+
+    subparsers.add_parser(
+        'stats',
+        help = 'Show how many entries there are of each status',
+    )
+
+    args = argparser.parse_args()
+
+    cache = WikiStatusCache(args.cache)
+
+    if args.command == 'expire':
+        count = cache.expire(args.patterns, args.status)
+        cache.save()
+        print(f'expired {count} entries')
+    elif args.command == 'stats':
+        counts: dict[str, int] = {}
+        fresh = 0
+        for key, entry in cache.entries.items():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            fresh += cache.is_fresh(key)
+        print(f'{len(cache.entries)} entries, {fresh} fresh')
+        for status, count in sorted(counts.items()):
+            print(f'  {status}: {count}')